@@ -1,21 +1,38 @@
+import importlib
 import logging
+import os
+import runpy
+import sys
+import threading
+import time
 import traceback
-import importlib
 
 import streamlit as st
+from streamlit import runtime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-CANDIDATE_MODULES = [
-    "app",      # common entrypoint
-    "main",     # alternate
-    "src.app",  # if organized under src
-    "app_main",
-    "app_src",
+# Dashboard script to serve: "new_app" or "protected_app".
+DASHBOARD_MODULE = os.environ.get("APP_DASH_MODULE", "new_app")
+# Load the dataset and the default view at server start (only when launched with `python app.py`).
+PREWARM = os.environ.get("APP_DASH_PREWARM", "1") != "0"
+
+# Imported up front (and timed) so the first visitor does not pay for them.
+# openpyxl, gdown and xlsxwriter stay deferred: snapshot hits never need them.
+HEAVY_MODULES = [
+    "numpy",
+    "pandas",
+    "pyarrow",
+    "plotly.express",
+    "dashboard.loader",
+    "dashboard.refresher",
+    "dashboard.metrics",
+    "dashboard.charts",
 ]
 
+
 def _show_traceback(e: Exception):
     tb = traceback.format_exc()
     logger.exception("Unhandled exception in Streamlit app")
@@ -26,50 +43,66 @@ def _show_traceback(e: Exception):
         # If Streamlit UI is not available, ensure traceback is printed to stderr
         print(tb)
 
-def _try_import_and_run():
-    """Try to import common module names and call a main() if present.
-
-    This helps keep heavy initialization out of top-level imports in the future.
-    If the user's app code runs at import-time, importing the module will execute it
-    and the UI will appear as expected.
-    """
-    for name in CANDIDATE_MODULES:
-        try:
-            logger.info(f"Attempting to import module: {name}")
-            mod = importlib.import_module(name)
-            logger.info(f"Successfully imported module: {name}")
-
-            # If the module exposes a callable named main, call it.
-            if hasattr(mod, "main") and callable(mod.main):
-                logger.info(f"Calling main() in module: {name}")
-                mod.main()
-            else:
-                # If there is no main, importing may have already executed Streamlit UI code.
-                logger.info(f"No main() found in module: {name}; assuming import executed the app.")
-            return True
-        except ModuleNotFoundError:
-            # This candidate doesn't exist; try the next
+
+def import_modules(names=HEAVY_MODULES):
+    """Import ``names`` that are not loaded yet, logging how long each took."""
+    for name in names:
+        if name in sys.modules:
             continue
-        except Exception as e:
-            # If import fails for any other reason, raise to be caught by caller
-            raise
+        start = time.perf_counter()
+        importlib.import_module(name)
+        logger.info(f"Imported {name} in {(time.perf_counter() - start) * 1000:.0f} ms")
 
-    # If we get here, none of the candidate modules were importable.
-    return False
 
-def main():
+def prewarm():
+    """Load the dataset and compute the default "Last 30 Days" view into the shared caches."""
+    start = time.perf_counter()
     try:
-        imported = _try_import_and_run()
-        if not imported:
-            st.title("App placeholder")
-            st.info("No app module found. Ensure your Streamlit entrypoint is set to the correct file (e.g., app.py) or add your app code to one of the common module names.)")
+        import_modules()
+        from dashboard.charts import FIGURES, figure
+        from dashboard.filters import preset_range
+        from dashboard.manifest import SOURCES
+        from dashboard.metrics import TAB_METRICS, FilterState, compute
+        from dashboard.refresher import shared_refresher
+
+        source = tuple(SOURCES) if len(SOURCES) > 1 else SOURCES[0]
+        dataset = shared_refresher(source).current()
+        logger.info(f"Prewarmed dataset {dataset.version[:12]} in {time.perf_counter() - start:.2f}s")
+
+        state = FilterState.create(*preset_range("Last 30 Days"), {})
+        for names in TAB_METRICS.values():
+            for name in names:
+                compute(name, dataset, state)
+        for name in FIGURES:
+            figure(name, dataset, state).to_json()
+        logger.info(f"Prewarmed the Last 30 Days view in {time.perf_counter() - start:.2f}s")
+    except Exception:
+        # The first visitor will load the data instead and see any error.
+        logger.exception("Prewarm failed")
 
+
+def launch(args):
+    """Start the Streamlit server on this file, prewarming in the background meanwhile."""
+    if PREWARM:
+        threading.Thread(target=prewarm, name="prewarm", daemon=True).start()
+    from streamlit.web import cli as stcli
+
+    sys.argv = ["streamlit", "run", os.path.abspath(__file__), *args]
+    sys.exit(stcli.main())
+
+
+def main():
+    """Run the dashboard script; Streamlit calls this on every rerun."""
+    try:
+        import_modules()
+        # run_module re-executes the script each rerun, unlike import_module.
+        runpy.run_module(DASHBOARD_MODULE, run_name="__main__")
     except Exception as e:
         _show_traceback(e)
 
 
 if __name__ == "__main__":
-    try:
+    if runtime.exists():
         main()
-    except Exception as e:
-        _show_traceback(e)
+    else:
+        launch(sys.argv[1:])
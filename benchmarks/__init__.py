@@ -0,0 +1 @@
+"""Performance benchmarks for the dashboard data layer, run with ``python -m benchmarks.run``."""
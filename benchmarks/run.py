@@ -0,0 +1,204 @@
+"""Time each stage of the dashboard data pipeline on synthetic workbooks.
+
+    python -m benchmarks.run --rows 10k --rows 1m --out bench.json
+    python -m benchmarks.run --rows 1m --baseline bench.json
+
+Stages are timed separately (parse, preprocess, index builds, filtering,
+every tab metric, the CCM delay join, drill-down pages and figure
+construction) and written as JSON. With ``--baseline`` each stage's median
+is compared to the stored run and the exit status is 1 if any stage got
+slower than ``--threshold``.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from benchmarks.synthetic import generate, parse_rows
+from dashboard.charts import FIGURES, figure
+from dashboard.drilldown import fetch_page
+from dashboard.episodes import PAIRING_RULES
+from dashboard.filters import preset_range
+from dashboard.ingest import parse_workbook
+from dashboard.loader import Dataset, add_row_keys, fetch_source, preprocess
+from dashboard.metrics import METRIC_CACHE, TAB_METRICS, FilterState, compute
+from dashboard.schema import concat_frames
+
+logger = logging.getLogger(__name__)
+
+FILTER_PRESETS = ["Last 30 Days", "Current Quarter", "Current Year"]
+
+
+class Timings:
+    """Collects wall-clock runs per named stage."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.runs = {}
+
+    def time(self, name, fn, setup=None, repeat=None):
+        """Run ``fn`` ``repeat`` times (``setup`` untimed before each run); returns the last result."""
+        result = None
+        for _ in range(repeat or self.repeat):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            result = fn()
+            self.runs.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        return {
+            name: {"median": statistics.median(runs), "min": min(runs), "runs": runs}
+            for name, runs in self.runs.items()
+        }
+
+
+def _states(dataset):
+    """Filter states for each preset, relative to the newest visit, with and without a multiselect."""
+    today = dataset.visits["Visit Date"].max().date()
+    providers = dataset.filter_index.options.get("Provider Name", [])[:3]
+    states = {}
+    for preset in FILTER_PRESETS:
+        start, end = preset_range(preset, today)
+        states[preset] = FilterState.create(start, end, {})
+        states[f"{preset} + providers"] = FilterState.create(start, end, {"Provider Name": providers})
+    return states
+
+
+def bench(rows, out_dir, repeat=3, rows_per_file=None):
+    """Run every stage on a ``rows``-visit dataset; returns ``{stage: stats}``."""
+    paths = generate(rows, out_dir, **({"rows_per_file": rows_per_file} if rows_per_file else {}))
+    timings = Timings(repeat)
+
+    # Parsing and preprocessing are slow and deterministic at scale: time them once.
+    frames = []
+    for i, path in enumerate(paths):
+        data = timings.time(f"download[{i}]", lambda: fetch_source(path), repeat=1)
+        raw, cpt_ref = timings.time(f"parse[{i}]", lambda: parse_workbook(data), repeat=1)
+        visits = timings.time(f"preprocess[{i}]", lambda: preprocess(add_row_keys(raw), cpt_ref), repeat=1)
+        frames.append(visits)
+    visits = timings.time("combine", lambda: concat_frames(frames), repeat=1)
+    dataset = Dataset(visits=visits, cpt_ref=cpt_ref, version=f"bench-{rows}", load_seconds=0.0, build_seconds=0.0)
+
+    for name in ["filter_index", "cube", "episodes"]:
+        timings.time(f"index.{name}", lambda: getattr(dataset, name), setup=lambda: dataset.__dict__.pop(name, None))
+
+    for label, state in _states(dataset).items():
+        timings.time(
+            f"filter.rows[{label}]",
+            lambda: dataset.filter_index.select(state.start, state.end, state.as_dict()),
+        )
+        timings.time(f"filter.cube[{label}]", lambda: dataset.cube.select(state.start, state.end, state.as_dict()))
+
+        # Each metric on a cold cache, with only the shared selections warmed.
+        def warm_selections():
+            METRIC_CACHE.clear()
+            compute("selection.cube", dataset, state)
+            compute("selection.view", dataset, state)
+
+        for names in TAB_METRICS.values():
+            for name in names:
+                timings.time(f"metric.{name}[{label}]", lambda: compute(name, dataset, state), setup=warm_selections)
+
+        # First page sorted by a numeric column, sort cold; then a later page of the cached sort.
+        timings.time(
+            f"drilldown.sort_page[{label}]",
+            lambda: fetch_page(dataset, state, 1, sort="Encounter Lag", ascending=False),
+            setup=warm_selections,
+        )
+        timings.time(f"drilldown.page[{label}]", lambda: fetch_page(dataset, state, 50, sort="Encounter Lag", ascending=False))
+
+        rows_selected = compute("selection.rows", dataset, state)
+        for rule in PAIRING_RULES:
+            timings.time(f"ccm_delays.{rule}[{label}]", lambda: dataset.episodes.delays(rows_selected, rule))
+
+        # Figures only, with their aggregates already cached.
+        def warm_metrics():
+            warm_selections()
+            for metric_name, _ in FIGURES.values():
+                compute(metric_name, dataset, state)
+
+        for name in FIGURES:
+            timings.time(f"figure.{name}[{label}]", lambda: figure(name, dataset, state), setup=warm_metrics)
+
+    METRIC_CACHE.clear()
+    return timings.summary()
+
+
+def compare(results, baseline, threshold, min_delta=0.002):
+    """Stages whose median grew by more than ``threshold`` x, as ``(key, old, new)``.
+
+    Slowdowns smaller than ``min_delta`` seconds are timer noise and never count.
+    """
+    regressions = []
+    for size, stages in results["sizes"].items():
+        for stage, stats in stages.items():
+            old = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if old is None:
+                continue
+            ratio = stats["median"] / max(old["median"], 1e-9)
+            regressed = ratio > threshold and stats["median"] - old["median"] > min_delta
+            marker = "  REGRESSION" if regressed else ""
+            print(f"{size:>10} {stage:<70} {old['median']:9.4f}s -> {stats['median']:9.4f}s ({ratio:5.2f}x){marker}", file=sys.stderr)
+            if regressed:
+                regressions.append((f"{size}/{stage}", old["median"], stats["median"]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", action="append", help="10k, 1m, 10m or a row count (repeatable)")
+    parser.add_argument("--out-dir", default=os.path.join(".cache", "bench"), help="where workbooks are generated")
+    parser.add_argument("--rows-per-file", type=int)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="write results JSON here")
+    parser.add_argument("--baseline", help="compare against a previous results JSON")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio that counts as a regression")
+    parser.add_argument("--min-delta", type=float, default=0.002, help="ignore slowdowns below this many seconds")
+    args = parser.parse_args(argv)
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+    for size in args.rows or ["10k"]:
+        rows = parse_rows(size)
+        logger.info(f"Benchmarking {rows} rows")
+        results["sizes"][str(rows)] = bench(rows, args.out_dir, args.repeat, args.rows_per_file)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        logger.info(f"Wrote {args.out}")
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold, args.min_delta)
+        if regressions:
+            logger.error(f"{len(regressions)} stage(s) slower than {args.threshold}x the baseline")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Per-stage JSON lines would drown the benchmark's own output.
+    logging.getLogger("dashboard.instrumentation").setLevel(logging.WARNING)
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Synthetic visit workbooks with the same layout as the real export.
+
+    python -m benchmarks.synthetic --rows 1m --out-dir .cache/bench
+
+Excel caps a sheet at 1,048,576 rows, so larger datasets are split into
+several workbooks (load them together through a manifest).
+"""
+import argparse
+import logging
+import os
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import xlsxwriter
+
+from dashboard.schema import CCM_CODE, EM_FOLLOW_UP_CODES, EM_INITIAL_CODES
+
+logger = logging.getLogger(__name__)
+
+SIZES = {"10k": 10_000, "1m": 1_000_000, "10m": 10_000_000}
+ROWS_PER_FILE = 1_000_000
+CHUNK_ROWS = 100_000
+
+COLUMNS = [
+    "Visit ID",
+    "Patient ID",
+    "Visit Date",
+    "Transaction Date",
+    "CPT Code",
+    "Provider Name",
+    "Facility Name",
+    "State",
+    "Payer Class",
+    "Encounter Type",
+]
+DATE_COLUMNS = ["Visit Date", "Transaction Date"]
+CPT_CODES = sorted(EM_INITIAL_CODES) + sorted(EM_FOLLOW_UP_CODES) + [CCM_CODE, "99490"]
+CPT_WEIGHTS = [0.06, 0.05, 0.04, 0.16, 0.2, 0.14, 0.08, 0.15, 0.12]
+STATES = ["TX", "CA", "NY", "FL", "GA", "OH"]
+PAYER_CLASSES = ["Medicare", "Medicaid", "Commercial", "Self Pay"]
+ENCOUNTER_TYPES = ["Office", "Nursing Facility", "Telehealth", "Home"]
+HISTORY_DAYS = 730
+
+
+def parse_rows(value):
+    """``"10k"``/``"1m"``/``"10m"`` or a plain integer."""
+    return SIZES.get(str(value).lower()) or int(value)
+
+
+def _dimensions(rows):
+    """Provider/facility/patient counts that grow with the dataset like the real one."""
+    providers = max(10, min(400, rows // 25_000))
+    facilities = max(20, min(1_500, rows // 5_000))
+    patients = max(100, rows // 12)
+    return providers, facilities, patients
+
+
+def generate_chunk(rng, first_id, rows, total_rows):
+    """Columns for ``rows`` visits starting at ``Visit ID`` ``first_id``.
+
+    Dates are days before today and text columns are indexes into their labels.
+    """
+    providers, facilities, patients = _dimensions(total_rows)
+    facility = rng.integers(0, facilities, rows)
+    visit_day = rng.integers(0, HISTORY_DAYS, rows)
+    lag = rng.gamma(2.0, 3.0, rows).astype(int)
+    return {
+        "Visit ID": np.arange(first_id, first_id + rows),
+        "Patient ID": rng.integers(100_000, 100_000 + patients, rows),
+        "Visit Date": visit_day,
+        "Transaction Date": np.maximum(visit_day - lag, 0),
+        "CPT Code": rng.choice(len(CPT_CODES), rows, p=CPT_WEIGHTS),
+        "Provider Name": rng.integers(0, providers, rows),
+        "Facility Name": facility,
+        # A facility sits in one state.
+        "State": facility % len(STATES),
+        "Payer Class": rng.choice(len(PAYER_CLASSES), rows, p=[0.55, 0.3, 0.1, 0.05]),
+        "Encounter Type": rng.choice(len(ENCOUNTER_TYPES), rows, p=[0.2, 0.6, 0.15, 0.05]),
+    }
+
+
+def write_workbook(path, first_id, rows, total_rows, rng, today=None):
+    """Write one workbook of ``rows`` visits plus the ``Sheet1`` CPT reference."""
+    today = today or date.today()
+    start = datetime.combine(today, datetime.min.time())
+    days = [start - timedelta(days=d) for d in range(HISTORY_DAYS)]
+    providers, facilities, _ = _dimensions(total_rows)
+    labels = {
+        "CPT Code": CPT_CODES,
+        "Provider Name": [f"Provider {i:03d}" for i in range(providers)],
+        "Facility Name": [f"Facility {i:04d}" for i in range(facilities)],
+        "State": STATES,
+        "Payer Class": PAYER_CLASSES,
+        "Encounter Type": ENCOUNTER_TYPES,
+    }
+
+    # constant_memory streams rows to disk, so the writer stays small at 1M rows.
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True})
+    date_format = workbook.add_format({"num_format": "yyyy-mm-dd"})
+    visits = workbook.add_worksheet("Visits")
+    visits.write_row(0, 0, COLUMNS)
+    row = 1
+    for offset in range(0, rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, rows - offset)
+        chunk = generate_chunk(rng, first_id + offset, n, total_rows)
+        values = []
+        for col in COLUMNS:
+            if col in labels:
+                values.append([labels[col][i] for i in chunk[col]])
+            elif col in DATE_COLUMNS:
+                values.append([days[d] for d in chunk[col]])
+            else:
+                values.append(chunk[col].tolist())
+        for record in zip(*values):
+            visits.write_row(row, 0, record[:2])
+            visits.write_datetime(row, 2, record[2], date_format)
+            visits.write_datetime(row, 3, record[3], date_format)
+            visits.write_row(row, 4, record[4:])
+            row += 1
+
+    reference = workbook.add_worksheet("Sheet1")
+    reference.write_row(0, 0, ["CPT Code", "Charge/Unit", "Expected"])
+    for i, code in enumerate(CPT_CODES, start=1):
+        reference.write_row(i, 0, [code, f"${100 + 15 * i:,}", 80.0 + 12.5 * i])
+    workbook.close()
+
+
+def generate(rows, out_dir, rows_per_file=ROWS_PER_FILE, seed=0):
+    """Write (or reuse) workbooks totalling ``rows`` visits; returns their paths."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = []
+    for part, first in enumerate(range(0, rows, rows_per_file)):
+        n = min(rows_per_file, rows - first)
+        path = os.path.join(out_dir, f"visits-{rows}-s{seed}-{part:02d}.xlsx")
+        if not os.path.exists(path):
+            logger.info(f"Writing {n} rows to {path}")
+            tmp = f"{path}.tmp.xlsx"
+            write_workbook(tmp, first + 1, n, rows, np.random.default_rng([seed, part]))
+            os.replace(tmp, path)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", default="10k", help="10k, 1m, 10m or a row count")
+    parser.add_argument("--out-dir", default=os.path.join(".cache", "bench"))
+    parser.add_argument("--rows-per-file", type=int, default=ROWS_PER_FILE)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path in generate(parse_rows(args.rows), args.out_dir, args.rows_per_file, args.seed):
+        print(path)
@@ -0,0 +1 @@
+"""Shared data and computation layer for the APP dashboard apps."""
@@ -0,0 +1,157 @@
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+from dashboard.loader import Dataset
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every worker builds its own.
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "lock"
+GENERATION_FILE = re.compile(r"gen-(\d+)\.(visits|cpt_ref)\.arrow$")
+
+
+class ArrowStore:
+    """Preprocessed datasets published as memory-mapped Arrow IPC files.
+
+    Several Streamlit processes share one ``root``. The process holding
+    :meth:`lock` builds a dataset and publishes it as a new generation;
+    ``CURRENT`` names the latest one. Every process (the publisher included)
+    then attaches to that file through a memory map, so the OS page cache
+    holds one copy of the visits for all of them.
+    """
+
+    def __init__(self, root, keep=2):
+        self.root = root
+        self.keep = keep
+
+    def _path(self, generation, part):
+        return os.path.join(self.root, f"gen-{generation:06d}.{part}.arrow")
+
+    @contextmanager
+    def lock(self, blocking=True):
+        """Hold the builder lock; yields ``False`` if non-blocking and already held."""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, LOCK_FILE), "a") as f:
+            if fcntl is None:
+                yield True
+                return
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def current(self):
+        """Metadata of the latest published generation, or ``None``."""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_current(self, info):
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        with open(tmp, "w") as f:
+            json.dump(info, f)
+        os.replace(tmp, os.path.join(self.root, CURRENT_FILE))
+
+    def _write_table(self, df, path):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        # Uncompressed, so readers can map the buffers instead of decoding them.
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+
+    def publish(self, dataset, fingerprint=None):
+        """Write ``dataset`` as the next generation and point ``CURRENT`` at it.
+
+        Call with :meth:`lock` held. Returns the new generation's metadata.
+        """
+        previous = self.current()
+        generation = previous["generation"] + 1 if previous else 1
+        os.makedirs(self.root, exist_ok=True)
+        self._write_table(dataset.visits, self._path(generation, "visits"))
+        self._write_table(dataset.cpt_ref, self._path(generation, "cpt_ref"))
+        info = {
+            "generation": generation,
+            "version": dataset.version,
+            "rows": len(dataset.visits),
+            "build_seconds": dataset.build_seconds,
+            "raw_columns": list(dataset.raw_columns),
+            "cpt_ref_hash": dataset.cpt_ref_hash,
+            "delta_rows": dataset.delta_rows,
+            "memory_rows": dataset.memory_rows,
+            "parts": dataset.parts,
+            "fingerprint": fingerprint,
+            "checked": time.time(),
+        }
+        self._write_current(info)
+        self.prune(generation)
+        logger.info(f"Published generation {generation} ({dataset.version[:12]}, {len(dataset.visits)} rows)")
+        return info
+
+    def mark_checked(self, fingerprint=None):
+        """Record that the source was checked and found unchanged. Call with :meth:`lock` held."""
+        info = self.current()
+        if info is not None:
+            info["fingerprint"] = fingerprint
+            info["checked"] = time.time()
+            self._write_current(info)
+
+    def _read_table(self, path):
+        # No context manager: the frame's buffers keep pointing into the map.
+        source = pa.memory_map(path, "r")
+        return pa.ipc.open_file(source).read_all().to_pandas(split_blocks=True)
+
+    def attach(self, info, started=None):
+        """Map the generation described by ``info`` into a :class:`Dataset`."""
+        start = time.perf_counter() if started is None else started
+        generation = info["generation"]
+        visits = self._read_table(self._path(generation, "visits"))
+        cpt_ref = self._read_table(self._path(generation, "cpt_ref"))
+        dataset = Dataset(
+            visits=visits,
+            cpt_ref=cpt_ref,
+            version=info["version"],
+            load_seconds=time.perf_counter() - start,
+            build_seconds=info["build_seconds"],
+            from_snapshot=True,
+            raw_columns=tuple(info["raw_columns"]),
+            cpt_ref_hash=info["cpt_ref_hash"],
+            delta_rows=info["delta_rows"],
+            memory_rows=info["memory_rows"],
+            parts=info.get("parts"),
+        )
+        logger.info(f"Attached generation {generation} ({len(visits)} rows) in {dataset.load_seconds:.2f}s")
+        return dataset
+
+    def prune(self, generation):
+        """Delete generations older than the ``keep`` most recent ones.
+
+        Processes still mapping a deleted file keep reading it until they
+        attach to a newer generation; the space is freed after that.
+        """
+        for name in os.listdir(self.root):
+            match = GENERATION_FILE.match(name)
+            if match and int(match.group(1)) <= generation - self.keep:
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except FileNotFoundError:
+                    pass
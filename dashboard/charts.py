@@ -0,0 +1,177 @@
+import os
+
+import pandas as pd
+import plotly.express as px
+import streamlit as st
+
+from dashboard.instrumentation import stage
+from dashboard.metrics import METRIC_CACHE, compute
+
+# Payload caps: series (traces/slices) per chart, plotted points per chart, and
+# the point count above which line charts switch to WebGL (browsers only allow
+# a handful of WebGL contexts per page, so small charts stay SVG).
+MAX_SERIES = int(os.environ.get("APP_DASH_MAX_SERIES", 12))
+MAX_POINTS = int(os.environ.get("APP_DASH_MAX_POINTS", 1500))
+WEBGL_POINTS = int(os.environ.get("APP_DASH_WEBGL_POINTS", 500))
+OTHER = "Other"
+
+# figure name -> (metric name, builder(aggregate) -> plotly Figure)
+FIGURES = {}
+
+
+def chart(name, metric_name):
+    """Register ``builder(aggregate)`` as figure ``name`` drawn from ``metric_name``."""
+    def register(builder):
+        FIGURES[name] = (metric_name, builder)
+        return builder
+    return register
+
+
+def _aggregate_key(df):
+    """Content hash of an aggregate, so equal aggregates share one figure."""
+    return (tuple(df.columns), len(df), int(pd.util.hash_pandas_object(df, index=False).sum()))
+
+
+def figure(name, dataset, state, cache=METRIC_CACHE):
+    """Return figure ``name`` for ``state``, building it only on a cache miss.
+
+    Built figures are also cached by the content of their aggregate, so a
+    refreshed dataset or another filter state that yields the same numbers
+    reuses the figure instead of rebuilding it.
+    """
+    metric_name, builder = FIGURES[name]
+
+    def build():
+        aggregate = compute(metric_name, dataset, state, cache=cache)
+
+        def draw():
+            with stage(f"figure.{name}", points=len(aggregate)):
+                return builder(aggregate)
+        return cache.get_or_compute(("figure", name, _aggregate_key(aggregate)), draw)
+    return cache.get_or_compute((dataset.version, state, f"figure:{name}"), build)
+
+
+def plotly_chart(name, dataset, state, cache=METRIC_CACHE):
+    """Draw figure ``name`` with ``st.plotly_chart``, timing the render and its payload size."""
+    fig = figure(name, dataset, state, cache)
+    payload = cache.get_or_compute((dataset.version, state, f"payload:{name}"), lambda: len(fig.to_json()))
+    with stage(f"render.{name}", payload_bytes=payload):
+        st.plotly_chart(fig, use_container_width=True)
+
+
+# -------------------- PAYLOAD LIMITS --------------------
+def top_n(df, series, value, agg="sum", keys=(), n=MAX_SERIES):
+    """Keep the ``n - 1`` largest ``series`` by total ``value`` and fold the rest into "Other".
+
+    Folded rows are combined per ``keys`` (e.g. the period) with ``agg``.
+    """
+    totals = df.groupby(series, observed=True)[value].sum()
+    if len(totals) <= n:
+        return df
+    keep = totals.nlargest(n - 1).index
+    names = df[series].astype(object).where(df[series].isin(keep), OTHER)
+    folded = df.assign(**{series: names})
+    return folded.groupby(list(keys) + [series], as_index=False, observed=True, sort=False)[value].agg(agg)
+
+
+def _coarser(labels):
+    """Relabel periods one step coarser: weeks to months, months to quarters; ``None`` at the top."""
+    sample = str(labels.iloc[0])
+    if "/" in sample:  # "2024-01-01/2024-01-07": the week's starting month
+        return labels.astype(str).str[:7]
+    if len(sample) == 7 and sample[4] == "-":  # "2024-01"
+        return pd.PeriodIndex(labels.astype(str), freq="M").asfreq("Q").astype(str)
+    return None
+
+
+def compact(df, x, series, value, agg="sum", max_series=MAX_SERIES, max_points=MAX_POINTS):
+    """Bound a long-format aggregate for plotting.
+
+    At most ``max_series`` series are kept (see :func:`top_n`), then the
+    period axis ``x`` is coarsened (weeks, months, quarters) until at most
+    ``max_points`` rows remain. ``agg`` combines the merged rows: ``"sum"``
+    for counts, ``"mean"`` for rates and averages.
+    """
+    compacted = top_n(df, series, value, agg, keys=[x] if x else [], n=max_series)
+    while x is not None and len(compacted) > max_points:
+        labels = _coarser(compacted[x])
+        if labels is None:
+            break
+        compacted = (
+            compacted.assign(**{x: labels.to_numpy()})
+            .groupby([x, series], as_index=False, observed=True, sort=False)[value]
+            .agg(agg)
+        )
+    if compacted is df:
+        return df
+    # Same trace order as the metric's groupby, with "Other" last.
+    ordered = compacted.assign(_other=compacted[series].eq(OTHER))
+    ordered = ordered.sort_values(["_other", series] + ([x] if x else []), kind="stable")
+    return ordered.drop(columns="_other").reset_index(drop=True)
+
+
+def _line_mode(df):
+    return "webgl" if len(df) > WEBGL_POINTS else "svg"
+
+
+# -------------------- EXECUTIVE --------------------
+@chart("provider_weekly_visits", "executive.provider_weekly")
+def provider_weekly_visits(weekly):
+    weekly = compact(weekly, "Week", "Provider Name", "Visit Count")
+    return px.bar(weekly, x="Week", y="Visit Count", color="Provider Name", barmode="group")
+
+
+@chart("provider_weekly_target", "executive.provider_weekly")
+def provider_weekly_target(weekly):
+    weekly = compact(weekly, "Week", "Provider Name", "% to Target", agg="mean")
+    fig = px.bar(weekly, x="Week", y="% to Target", color="Provider Name", barmode="group")
+    fig.update_yaxes(range=[0, 150])
+    return fig
+
+
+# -------------------- OPERATIONS --------------------
+@chart("facility_monthly_visits", "operations.facility_monthly")
+def facility_monthly_visits(monthly):
+    monthly = compact(monthly, "Month", "Facility Name", "Visit Count")
+    return px.bar(monthly, x="Month", y="Visit Count", color="Facility Name", barmode="stack")
+
+
+@chart("facility_monthly_target", "operations.facility_monthly")
+def facility_monthly_target(monthly):
+    monthly = compact(monthly, "Month", "Facility Name", "% to Target", agg="mean")
+    fig = px.line(
+        monthly, x="Month", y="% to Target", color="Facility Name", markers=True, render_mode=_line_mode(monthly)
+    )
+    fig.update_yaxes(range=[0, 150])
+    return fig
+
+
+@chart("facility_ramp", "operations.facility_ramp")
+def facility_ramp(ramp):
+    ramp = compact(ramp, "Week", "Facility Name", "% Ramp", agg="mean")
+    return px.area(ramp, x="Week", y="% Ramp", color="Facility Name")
+
+
+@chart("provider_working_days", "operations.provider_working_days")
+def provider_working_days(work):
+    work = compact(work, "Month", "Provider Name", "Working Days", agg="mean")
+    return px.bar(work, x="Month", y="Working Days", color="Provider Name", barmode="group")
+
+
+# -------------------- QUALITY --------------------
+@chart("provider_lag", "quality.provider_lag")
+def provider_lag(lag):
+    lag = compact(lag, "Week", "Provider Name", "Encounter Lag", agg="mean")
+    return px.line(lag, x="Week", y="Encounter Lag", color="Provider Name", markers=True, render_mode=_line_mode(lag))
+
+
+@chart("cpt_initial", "quality.cpt_initial")
+def cpt_initial(init):
+    init = compact(init, None, "Provider Name", "Count")
+    return px.pie(init, names="Provider Name", values="Count", title="Initial Visits (99304–99306)")
+
+
+@chart("cpt_follow_up", "quality.cpt_follow_up")
+def cpt_follow_up(follow):
+    follow = compact(follow, None, "Provider Name", "Count")
+    return px.pie(follow, names="Provider Name", values="Count", title="Follow-up Visits (99307–99310)")
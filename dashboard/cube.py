@@ -0,0 +1,192 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from dashboard.filters import day_bounds
+from dashboard.schema import PERIOD_FREQS, period_ordinals
+
+logger = logging.getLogger(__name__)
+
+# Every sidebar filter plus CPT Category, so any chart can be answered by a rollup.
+CUBE_DIMENSIONS = [
+    "Provider Name",
+    "Facility Name",
+    "State",
+    "Payer Class",
+    "Encounter Type",
+    "CPT Category",
+]
+# Visits per cube row below which the cube isn't kept: it would be about as
+# large as the visit table and no faster to roll up.
+CUBE_MIN_RATIO = float(os.environ.get("APP_DASH_CUBE_MIN_RATIO", 2.0))
+
+
+class VisitCube:
+    """Visit measures pre-aggregated over the filter dimensions x day.
+
+    Each cube row holds, for one combination of dimension values on one day,
+    the ``Visit ID`` count and the sum/count of ``Encounter Lag``. The day
+    itself is part of the key, so distinct working days fall out of a
+    rollup without touching the raw rows. Rows without a ``Visit Date`` can
+    never pass the date filter and are left out.
+
+    How much that saves depends on the data: with many distinct dimension
+    combinations per day the cube has about one row per visit. When it
+    holds fewer than ``min_ratio`` visits per row and a ``filter_index`` is
+    given, the cube is dropped after measuring it and :meth:`select` returns
+    a :class:`RowSlice` over the selected visit rows instead, so no second
+    copy of the table is kept.
+    """
+
+    def __init__(self, df, dimensions=CUBE_DIMENSIONS, filter_index=None, min_ratio=CUBE_MIN_RATIO):
+        self.dimensions = [c for c in dimensions if c in df.columns]
+        self.visits = df
+        self.filter_index = None
+        self.ratio = None
+        if "Visit Date" not in df.columns:
+            self.frame = pd.DataFrame(columns=self.dimensions + ["Day", "visits", "lag_sum", "lag_count"])
+            self._days = np.empty(0, dtype=np.int64)
+            return
+
+        valid = df["Visit Date"].notna().to_numpy()
+        keys = df.loc[valid, self.dimensions].copy()
+        keys["Day"] = df.loc[valid, "Visit Date"].dt.normalize()
+        keys["visits"] = df.loc[valid, "Visit ID"].notna().to_numpy(dtype=np.int64)
+        if "Encounter Lag" in df.columns:
+            lag = pd.to_numeric(df.loc[valid, "Encounter Lag"], errors="coerce")
+        else:
+            lag = pd.Series(np.nan, index=keys.index)
+        keys["lag_sum"] = lag.fillna(0).to_numpy(dtype=float)
+        keys["lag_count"] = lag.notna().to_numpy(dtype=np.int64)
+
+        frame = (
+            keys.groupby(self.dimensions + ["Day"], observed=True, dropna=False, sort=False)
+            [["visits", "lag_sum", "lag_count"]]
+            .sum()
+            .reset_index()
+            .sort_values("Day", kind="stable", ignore_index=True)
+        )
+        self.ratio = len(keys) / max(len(frame), 1)
+        if filter_index is not None and self.ratio < min_ratio:
+            logger.info(
+                f"Visit cube has {len(frame)} rows for {len(keys)} visits ({self.ratio:.2f} visits/row); "
+                "rolling up selected visit rows instead"
+            )
+            self.frame = None
+            self.filter_index = filter_index
+            return
+        logger.info(f"Visit cube has {len(frame)} rows for {len(keys)} visits ({self.ratio:.2f} visits/row)")
+        for col, freq in PERIOD_FREQS.items():
+            frame[col] = period_ordinals(frame["Day"], freq)
+        self.frame = frame
+        self._days = frame["Day"].to_numpy(dtype="datetime64[ns]").view("i8")
+
+    @property
+    def materialized(self):
+        """Whether the aggregated cube is kept, rather than rolling up visit rows."""
+        return self.frame is not None
+
+    def __len__(self):
+        return len(self.frame) if self.materialized else len(self.visits)
+
+    def select(self, start, end, selections=None, rows=None):
+        """Cube rows for an inclusive date range and ``{column: values}`` filters.
+
+        Without a materialized cube, the filtered visit rows are rolled up
+        instead; pass ``rows`` if the same filters were already resolved
+        with the :class:`~dashboard.filters.FilterIndex`.
+        """
+        if not self.materialized:
+            if rows is None:
+                rows = self.filter_index.select(start, end, selections or {})
+            return RowSlice(self.visits, rows)
+        lo, hi = day_bounds(start, end)
+        left = np.searchsorted(self._days, lo, side="left")
+        right = np.searchsorted(self._days, hi, side="left")
+        frame = self.frame.iloc[left:right]
+        for col, values in (selections or {}).items():
+            if values and col in frame.columns:
+                frame = frame[frame[col].isin(values)]
+        return CubeSlice(frame)
+
+
+class CubeSlice:
+    """A filtered part of a :class:`VisitCube` that charts roll up from."""
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    @property
+    def nbytes(self):
+        return int(self.frame.memory_usage(index=True).sum())
+
+    def _columns(self, columns):
+        return self.frame[columns]
+
+    def where(self, column, value):
+        """Restrict to cube rows where ``column == value`` (e.g. a CPT Category)."""
+        if column not in self.frame.columns:
+            return CubeSlice(self.frame.iloc[0:0])
+        return CubeSlice(self.frame[self.frame[column] == value])
+
+    def _group(self, by, measures):
+        return self._columns(by + measures).groupby(by, observed=True, sort=True)
+
+    def count(self, by, name="Visit ID"):
+        """Visit count per group, like ``df.groupby(by)['Visit ID'].count()``."""
+        return self._group(by, ["visits"])["visits"].sum().reset_index(name=name)
+
+    def mean_lag(self, by, name="Encounter Lag"):
+        """Mean ``Encounter Lag`` per group, like ``df.groupby(by)['Encounter Lag'].mean()``."""
+        sums = self._group(by, ["lag_sum", "lag_count"]).sum()
+        mean = sums["lag_sum"] / sums["lag_count"].where(sums["lag_count"] > 0)
+        return mean.reset_index(name=name)
+
+    def working_days(self, by, name="Working Days"):
+        """Distinct visit days per group."""
+        days = self._columns(by + ["Day"]).drop_duplicates()
+        return days.groupby(by, observed=True, sort=True).size().reset_index(name=name)
+
+
+class RowSlice(CubeSlice):
+    """The :class:`CubeSlice` rollups computed from selected visit rows.
+
+    Only the row positions are held; each rollup takes just the columns it
+    groups by from the shared visit table, one row per visit.
+    """
+
+    def __init__(self, visits, rows):
+        self.visits = visits
+        self.rows = rows
+
+    @property
+    def nbytes(self):
+        return int(self.rows.nbytes)
+
+    def _columns(self, columns):
+        frame = {}
+        for col in columns:
+            if col == "Day":
+                frame[col] = self.visits["Visit Date"].take(self.rows).dt.normalize()
+            elif col == "visits":
+                frame[col] = self.visits["Visit ID"].take(self.rows).notna().astype(np.int64)
+            elif col in ("lag_sum", "lag_count"):
+                if "Encounter Lag" in self.visits.columns:
+                    lag = pd.to_numeric(self.visits["Encounter Lag"].take(self.rows), errors="coerce")
+                else:
+                    lag = pd.Series(np.nan, index=self.visits.index.take(self.rows))
+                frame[col] = lag.fillna(0).astype(float) if col == "lag_sum" else lag.notna().astype(np.int64)
+            elif col in PERIOD_FREQS and col not in self.visits.columns:
+                frame[col] = period_ordinals(self.visits["Visit Date"].take(self.rows), PERIOD_FREQS[col])
+            else:
+                frame[col] = self.visits[col].take(self.rows)
+        return pd.DataFrame(frame)
+
+    def where(self, column, value):
+        """Restrict to rows where ``column == value`` (e.g. a CPT Category)."""
+        if column not in self.visits.columns:
+            return RowSlice(self.visits, self.rows[:0])
+        matches = (self.visits[column].take(self.rows) == value).to_numpy(dtype=bool)
+        return RowSlice(self.visits, self.rows[matches])
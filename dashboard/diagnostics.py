@@ -0,0 +1,70 @@
+import logging
+import os
+import platform
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, RSS reads as 0.
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SECONDS = 5
+HISTORY_SIZE = 720
+
+
+def process_rss():
+    """Current resident set size of this process in bytes, or 0 where it can't be read."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        pass
+    if resource is None:
+        return 0
+    # Peak rather than current RSS, but better than nothing off Linux.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if platform.system() == "Darwin" else peak * 1024
+
+
+def active_sessions():
+    """Number of connected Streamlit sessions, or ``None`` outside a server."""
+    try:
+        from streamlit.runtime import Runtime
+
+        return Runtime.instance()._session_mgr.num_active_sessions()
+    except Exception:
+        return None
+
+
+class MemoryHistory:
+    """Rolling samples of process memory against active sessions."""
+
+    def __init__(self, maxlen=HISTORY_SIZE, interval=SAMPLE_SECONDS):
+        self.interval = interval
+        self._samples = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def record(self):
+        """Take a sample unless one was taken in the last ``interval`` seconds."""
+        now = time.time()
+        with self._lock:
+            if self._samples and now - self._samples[-1][0] < self.interval:
+                return
+            self._samples.append((now, active_sessions(), process_rss()))
+
+    def frame(self):
+        with self._lock:
+            samples = list(self._samples)
+        history = pd.DataFrame(samples, columns=["Time", "Active Sessions", "RSS (MB)"])
+        history["Time"] = pd.to_datetime(history["Time"], unit="s")
+        history["RSS (MB)"] = history["RSS (MB)"] / 2**20
+        return history.set_index("Time")
+
+
+MEMORY_HISTORY = MemoryHistory()
@@ -0,0 +1,116 @@
+import os
+
+import streamlit as st
+
+from dashboard.instrumentation import stage
+from dashboard.metrics import METRIC_CACHE, FilterState, compute
+from dashboard.schema import label_periods
+from dashboard.views import VisitView
+
+PAGE_ROWS = int(os.environ.get("APP_DASH_PAGE_ROWS", 100))
+
+# Columns shown until the user picks others.
+DEFAULT_COLUMNS = [
+    "Visit Date",
+    "Patient ID",
+    "Provider Name",
+    "Facility Name",
+    "CPT Code",
+    "CPT Category",
+    "Payer Class",
+    "Encounter Type",
+    "Encounter Lag",
+]
+
+
+def sorted_view(dataset, state, column=None, ascending=True, cache=METRIC_CACHE):
+    """The rows ``state`` selects as a :class:`VisitView`, sorted by ``column`` if given."""
+    view = compute("selection.view", dataset, state, cache=cache)
+    if column is None:
+        return view
+
+    def build():
+        with stage("drilldown.sort", rows=len(view), column=column):
+            return VisitView(view.visits, dataset.sort_index.order(view.rows, column, ascending))
+    return cache.get_or_compute((dataset.version, state, f"drilldown.sort:{column}:{ascending}"), build)
+
+
+def fetch_page(dataset, state, page, page_rows=PAGE_ROWS, sort=None, ascending=True, columns=None):
+    """Return ``(frame, total_rows)`` for 1-based ``page`` of the selection.
+
+    Only ``columns`` of the page's rows are materialized, so the cost is the
+    same for ten selected rows or ten million.
+    """
+    view = sorted_view(dataset, state, sort, ascending)
+    start = (page - 1) * page_rows
+    with stage("drilldown.page", rows=len(view), page=page) as fields:
+        frame = label_periods(view.frame(columns, rows=slice(start, start + page_rows)))
+        fields["page_rows"] = len(frame)
+    return frame, len(view)
+
+
+# -------------------- UI --------------------
+def _page_controls(total_rows, key, page_rows=PAGE_ROWS):
+    pages = max(1, -(-total_rows // page_rows))
+    # A narrower selection may have fewer pages than the one last viewed.
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"{key}_page")
+    start = (page - 1) * page_rows
+    st.caption(f"Rows {min(start + 1, total_rows):,}–{min(start + page_rows, total_rows):,} of {total_rows:,}")
+    return page
+
+
+def show_page(frame, gradient=None, cmap="Oranges"):
+    """Render one page, shading ``gradient`` columns (default: numeric ones).
+
+    The Styler only ever sees this page, so its HTML is bounded by the page size.
+    """
+    if gradient is None:
+        subset = list(frame.select_dtypes("number").columns)
+    else:
+        subset = [col for col in gradient if col in frame.columns]
+    with stage("render.drilldown", rows=len(frame)):
+        if subset and not frame.empty:
+            st.dataframe(frame.style.background_gradient(cmap=cmap, subset=subset), hide_index=True)
+        else:
+            st.dataframe(frame, hide_index=True)
+
+
+def paged_table(df, key, gradient=None, cmap="Oranges", page_rows=PAGE_ROWS):
+    """Sortable, paginated display of an in-memory aggregate such as the CCM delay summary."""
+    sort_col, desc_col = st.columns([3, 1])
+    sort = sort_col.selectbox("Sort by", list(df.columns), key=f"{key}_sort")
+    descending = desc_col.checkbox("Descending", key=f"{key}_desc")
+    ordered = df.sort_values(sort, ascending=not descending, kind="stable", na_position="last")
+    page = _page_controls(len(ordered), key, page_rows)
+    start = (page - 1) * page_rows
+    show_page(ordered.iloc[start:start + page_rows].reset_index(drop=True), gradient, cmap)
+
+
+def drilldown_table(dataset, state, key, column=None, gradient=("Encounter Lag",), cmap="Oranges"):
+    """Paginated visits behind a chart: the current selection, optionally narrowed to one ``column`` value.
+
+    Sorting, column projection and paging all happen on the server; the
+    browser only receives the visible page.
+    """
+    available = [col for col in dataset.visits.columns if not str(col).startswith("_")]
+    selection = state.as_dict()
+    if column is not None:
+        values = selection.get(column) or dataset.filter_index.options.get(column, [])
+        value = st.selectbox(column, ["All", *values], key=f"{key}_value")
+        if value != "All":
+            state = FilterState.create(state.start, state.end, {**selection, column: [value]})
+
+    columns = st.multiselect(
+        "Columns", available, default=[col for col in DEFAULT_COLUMNS if col in available], key=f"{key}_columns"
+    ) or available
+    sort_col, desc_col = st.columns([3, 1])
+    sort = sort_col.selectbox("Sort by", ["(none)", *columns], key=f"{key}_sort")
+    descending = desc_col.checkbox("Descending", key=f"{key}_desc")
+
+    page = _page_controls(len(compute("selection.view", dataset, state)), key)
+    frame, _ = fetch_page(
+        dataset, state, page, sort=None if sort == "(none)" else sort, ascending=not descending, columns=columns
+    )
+    show_page(frame, gradient, cmap)
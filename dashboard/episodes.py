@@ -0,0 +1,107 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from dashboard.schema import CCM_CODE, EM_CODES
+
+# How an E/M visit is paired with a patient's first CCM (99487) visit:
+#   "first"             - the patient's first E/M visit, whenever it happened
+#   "nearest_preceding" - the latest E/M visit on or before that CCM visit
+PAIRING_RULES = ("first", "nearest_preceding")
+PAIRING_LABELS = {"first": "First E/M visit", "nearest_preceding": "Nearest preceding E/M visit"}
+# Rule the dashboards start with; users can switch it in the sidebar.
+DEFAULT_PAIRING = os.environ.get("APP_DASH_CCM_PAIRING", "first")
+if DEFAULT_PAIRING not in PAIRING_RULES:
+    raise ValueError(f"APP_DASH_CCM_PAIRING must be one of {PAIRING_RULES}, not {DEFAULT_PAIRING!r}")
+
+DELAY_COLUMNS = ["Patient ID", "Facility Name", "E/M Date", "CCM Date", "CCM Delay (days)"]
+
+
+class PatientEpisodes:
+    """Per-patient E/M and CCM visit timelines, sorted once per dataset.
+
+    Only E/M and 99487 rows are kept, ordered by (patient, visit date), so a
+    delay computation is a single linear pass over a row selection instead
+    of a patient-level join.
+    """
+
+    def __init__(self, df):
+        self.size = len(df)
+        required = {"CPT Code", "Patient ID", "Visit Date"}
+        if not required.issubset(df.columns):
+            self._rows = np.empty(0, dtype=np.int64)
+            return
+
+        codes = df["CPT Code"]
+        is_em = codes.isin(EM_CODES).to_numpy()
+        is_ccm = (codes == CCM_CODE).to_numpy()
+        patient, self._patients = pd.factorize(df["Patient ID"])
+        dates = df["Visit Date"].to_numpy(dtype="datetime64[ns]")
+
+        rows = np.flatnonzero((is_em | is_ccm) & (patient >= 0) & ~np.isnat(dates))
+        # E/M before CCM on the same day, so "on or before" pairing sees it.
+        rows = rows[np.lexsort((is_ccm[rows], dates[rows], patient[rows]))]
+        self._rows = rows
+        self._patient = patient[rows]
+        self._date = dates[rows]
+        self._is_ccm = is_ccm[rows]
+        if "Facility Name" in df.columns:
+            self._facility = df["Facility Name"].to_numpy(dtype=object)[rows]
+        else:
+            self._facility = np.full(len(rows), None, dtype=object)
+
+    def _firsts(self, keep):
+        """Positions (into the sorted arrays) of each patient's first kept row."""
+        idx = np.flatnonzero(keep)
+        patient = self._patient[idx]
+        first = np.ones(len(idx), dtype=bool)
+        first[1:] = patient[1:] != patient[:-1]
+        return idx[first]
+
+    def delays(self, positions=None, rule="first"):
+        """One row per patient with both an E/M and a CCM visit in ``positions``.
+
+        ``positions`` is a row selection over the dataset (``None`` means all
+        rows). The delay is measured from the paired E/M visit to the
+        patient's first CCM visit; see :data:`PAIRING_RULES`.
+        """
+        if rule not in PAIRING_RULES:
+            raise ValueError(f"Unknown pairing rule {rule!r}; expected one of {PAIRING_RULES}")
+        if not len(self._rows):
+            return pd.DataFrame(columns=DELAY_COLUMNS)
+
+        if positions is None:
+            selected = np.ones(len(self._rows), dtype=bool)
+        else:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[positions] = True
+            selected = mask[self._rows]
+
+        ccm = self._firsts(selected & self._is_ccm)
+        if rule == "first":
+            em = self._firsts(selected & ~self._is_ccm)
+            _, em_at, ccm_at = np.intersect1d(self._patient[em], self._patient[ccm], return_indices=True)
+            em, ccm = em[em_at], ccm[ccm_at]
+        else:
+            # Sorted by (patient, date), so the nearest preceding E/M for a CCM
+            # row is the last selected E/M row before it for the same patient.
+            em_rows = np.flatnonzero(selected & ~self._is_ccm)
+            before = np.searchsorted(em_rows, ccm, side="left") - 1
+            found = before >= 0
+            found[found] = self._patient[em_rows[before[found]]] == self._patient[ccm[found]]
+            em, ccm = em_rows[before[found]], ccm[found]
+
+        delays = pd.DataFrame({
+            "Patient ID": self._patients.take(self._patient[ccm]),
+            "Facility Name": self._facility[em],
+            "E/M Date": self._date[em],
+            "CCM Date": self._date[ccm],
+        })
+        delays["CCM Delay (days)"] = (delays["CCM Date"] - delays["E/M Date"]).dt.days
+        return delays
+
+
+def delay_by_facility(delays):
+    """Mean CCM start delay per facility of the paired E/M visit."""
+    return delays.groupby("Facility Name", sort=True)["CCM Delay (days)"].mean().reset_index()
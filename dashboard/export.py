@@ -0,0 +1,271 @@
+import csv
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+import zipfile
+
+import streamlit as st
+
+from dashboard.episodes import DEFAULT_PAIRING
+from dashboard.instrumentation import stage
+from dashboard.loader import CACHE_DIR
+from dashboard.metrics import compute
+from dashboard.schema import label_periods
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.path.join(CACHE_DIR, "exports") if CACHE_DIR else os.path.join(".cache", "exports")
+EXPORT_CHUNK_ROWS = int(os.environ.get("APP_DASH_EXPORT_CHUNK_ROWS", 50_000))
+# Finished export jobs remembered per process; older ones are forgotten.
+EXPORT_KEEP = int(os.environ.get("APP_DASH_EXPORT_KEEP", 8))
+# Export files older than this are deleted, unless a remembered job still serves them.
+# Forgetting a job never deletes its file: another session's download button may point at it.
+EXPORT_TTL_SECONDS = float(os.environ.get("APP_DASH_EXPORT_TTL_SECONDS", 6 * 60 * 60))
+POLL_SECONDS = 1.0
+
+# Excel's row limit minus the header; longer selections continue on "Visits (2)", ...
+XLSX_SHEET_ROWS = 1_048_575
+
+FORMATS = {
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": (".zip", "application/zip"),
+}
+
+# sheet / CSV name -> metric written next to the visit rows
+AGGREGATES = {
+    "Provider Weekly": "executive.provider_weekly",
+    "Facility Monthly": "operations.facility_monthly",
+    "Facility Ramp": "operations.facility_ramp",
+    "Working Days": "operations.provider_working_days",
+    "CCM Delay": "growth.ccm_delay_by_facility",
+    "Encounter Lag": "quality.provider_lag",
+    "CPT Initial": "quality.cpt_initial",
+    "CPT Follow-up": "quality.cpt_follow_up",
+}
+
+
+def export_columns(view):
+    """Visit columns worth exporting: everything but internal ``_`` keys."""
+    return [col for col in view.columns if not str(col).startswith("_")]
+
+
+def visit_chunks(view, columns, chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the selected rows ``chunk_rows`` at a time, with periods as labels."""
+    for offset in range(0, len(view), chunk_rows):
+        yield label_periods(view.frame(columns, rows=slice(offset, offset + chunk_rows)))
+
+
+def _records(df):
+    """Rows of ``df`` as tuples of plain Python values, missing values as ``None``."""
+    values = df.astype(object)
+    return values.where(df.notna(), None).itertuples(index=False, name=None)
+
+
+class ExportJob:
+    """Write one filtered selection and its tab aggregates to a file on a worker thread.
+
+    The visit rows are streamed in chunks of the shared table, so memory
+    stays flat however many rows are selected; the file is written under a
+    temporary name and renamed once complete.
+    """
+
+    def __init__(self, dataset, state, fmt, path, pairing=DEFAULT_PAIRING):
+        self.dataset = dataset
+        self.state = state
+        self.fmt = fmt
+        self.path = path
+        self.pairing = pairing
+        self.total_rows = 0
+        self.rows_written = 0
+        self.size = 0
+        self.started = None
+        self.seconds = None
+        self.error = None
+        self._thread = None
+
+    @property
+    def done(self):
+        return self.seconds is not None or self.error is not None
+
+    @property
+    def progress(self):
+        return self.rows_written / self.total_rows if self.total_rows else (1.0 if self.done else 0.0)
+
+    @property
+    def file_name(self):
+        return os.path.basename(self.path)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name=f"export-{self.file_name}", daemon=True)
+        self._thread.start()
+        return self
+
+    def read(self):
+        """The finished file's bytes, for a deferred ``st.download_button``."""
+        with open(self.path, "rb") as f:
+            return f.read()
+
+    def _run(self):
+        root, ext = os.path.splitext(self.path)
+        tmp = f"{root}.tmp{ext}"
+        try:
+            view = compute("selection.view", self.dataset, self.state)
+            self.total_rows = len(view)
+            with stage(f"export.{self.fmt.lower()}", rows=len(view)):
+                aggregates = {
+                    name: compute(metric, self.dataset, self.state, pairing=self.pairing)
+                    for name, metric in AGGREGATES.items()
+                }
+                writer = write_xlsx if self.fmt == "Excel" else write_csv_zip
+                writer(tmp, view, aggregates, self._advance)
+                os.replace(tmp, self.path)
+            self.size = os.path.getsize(self.path)
+            self.seconds = time.perf_counter() - self.started
+            logger.info(f"Exported {len(view)} rows to {self.path} in {self.seconds:.2f}s")
+        except Exception as e:
+            logger.exception(f"Export to {self.path} failed")
+            self.error = str(e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def _advance(self, rows):
+        self.rows_written += rows
+
+
+def write_xlsx(path, view, aggregates, progress=None):
+    """Stream ``view``'s rows and the ``aggregates`` frames into an .xlsx at ``path``.
+
+    ``constant_memory`` flushes each row to disk as it is written, so rows
+    must be written top to bottom, one sheet at a time.
+    """
+    import xlsxwriter
+
+    columns = export_columns(view)
+    workbook = xlsxwriter.Workbook(path, {"constant_memory": True, "default_date_format": "yyyy-mm-dd"})
+    sheets, row = 0, XLSX_SHEET_ROWS
+    for chunk in visit_chunks(view, columns):
+        for record in _records(chunk):
+            if row == XLSX_SHEET_ROWS:
+                sheets += 1
+                sheet = workbook.add_worksheet("Visits" if sheets == 1 else f"Visits ({sheets})")
+                sheet.write_row(0, 0, columns)
+                row = 0
+            row += 1
+            sheet.write_row(row, 0, record)
+        if progress is not None:
+            progress(len(chunk))
+    if sheets == 0:
+        workbook.add_worksheet("Visits").write_row(0, 0, columns)
+
+    for name, df in aggregates.items():
+        sheet = workbook.add_worksheet(name)
+        sheet.write_row(0, 0, [str(col) for col in df.columns])
+        for row, record in enumerate(_records(df), start=1):
+            sheet.write_row(row, 0, record)
+    workbook.close()
+
+
+def write_csv_zip(path, view, aggregates, progress=None):
+    """Write ``visits.csv`` plus one CSV per aggregate into a zip at ``path``, chunk by chunk."""
+    columns = export_columns(view)
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        with archive.open("visits.csv", "w", force_zip64=True) as raw:
+            out = io.TextIOWrapper(raw, encoding="utf-8", newline="")
+            csv.writer(out).writerow(columns)
+            for chunk in visit_chunks(view, columns):
+                chunk.to_csv(out, header=False, index=False, date_format="%Y-%m-%d")
+                if progress is not None:
+                    progress(len(chunk))
+            out.flush()
+            out.detach()
+        for name, df in aggregates.items():
+            archive.writestr(f"{name.lower().replace(' ', '_')}.csv", df.to_csv(index=False))
+
+
+# -------------------- JOBS --------------------
+# (dataset version, filter state, pairing rule, format) -> ExportJob, oldest first.
+_JOBS = {}
+_JOBS_LOCK = threading.Lock()
+
+
+def _export_path(dataset, state, pairing, fmt):
+    key = hashlib.sha1(repr((dataset.version, state, pairing)).encode()).hexdigest()[:12]
+    return os.path.join(EXPORT_DIR, f"visits-{state.start}-{state.end}-{key}{FORMATS[fmt][0]}")
+
+
+def find_export(dataset, state, fmt, pairing=DEFAULT_PAIRING):
+    """The export already started for this selection, if any."""
+    with _JOBS_LOCK:
+        return _JOBS.get((dataset.version, state, pairing, fmt))
+
+
+def start_export(dataset, state, fmt, pairing=DEFAULT_PAIRING):
+    """Start (or return the running) export of the rows ``state`` selects, in ``fmt``."""
+    key = (dataset.version, state, pairing, fmt)
+    with _JOBS_LOCK:
+        job = _JOBS.get(key)
+        if job is not None and job.error is None:
+            return job
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        path = _export_path(dataset, state, pairing, fmt)
+        job = _JOBS[key] = ExportJob(dataset, state, fmt, path, pairing).start()
+        # Forget the oldest finished exports beyond the limit; their files expire by age.
+        finished = [k for k, j in _JOBS.items() if j.done]
+        for old_key in finished[:max(0, len(_JOBS) - EXPORT_KEEP)]:
+            del _JOBS[old_key]
+        _remove_expired({j.path for j in _JOBS.values()})
+    return job
+
+
+def _remove_expired(keep, ttl=EXPORT_TTL_SECONDS):
+    """Delete export files older than ``ttl`` seconds, except the paths in ``keep``."""
+    cutoff = time.time() - ttl
+    for entry in os.scandir(EXPORT_DIR):
+        if entry.path in keep:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Removed by another process sharing the cache directory.
+            pass
+
+
+# -------------------- UI --------------------
+def export_controls(dataset, state, pairing=DEFAULT_PAIRING):
+    """Sidebar controls: pick a format, start the export, then download it when ready."""
+    fmt = st.sidebar.radio("Export format", list(FORMATS), horizontal=True)
+    job = find_export(dataset, state, fmt, pairing)
+    if job is None or job.error is not None:
+        if job is not None:
+            st.sidebar.warning(f"Export failed: {job.error}")
+        if st.sidebar.button("Prepare export"):
+            job = start_export(dataset, state, fmt, pairing)
+    if job is None or job.error is not None:
+        return
+    if job.done:
+        st.sidebar.download_button(
+            f"Download {job.file_name}",
+            # Read only when clicked, not on every rerun that shows the button. Streamlit
+            # holds the bytes in memory while serving them, so the file must fit in RAM.
+            data=job.read,
+            file_name=job.file_name,
+            mime=FORMATS[fmt][1],
+        )
+        st.sidebar.caption(
+            f"{job.total_rows:,} rows exported in {job.seconds:.1f}s ({job.size / 2**20:.1f} MB)"
+        )
+    else:
+        with st.sidebar:
+            _export_progress(job)
+
+
+@st.fragment(run_every=POLL_SECONDS)
+def _export_progress(job):
+    if job.done:
+        st.rerun()
+    st.progress(job.progress, text=f"Exporting {job.rows_written:,} / {job.total_rows:,} rows…")
@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from dashboard.instrumentation import stage
+
+# Sidebar multiselect filters: column -> label.
+FILTER_COLUMNS = {
+    "Provider Name": "Provider",
+    "Facility Name": "Facility",
+    "State": "State/Region",
+    "Payer Class": "Payer Class",
+    "Encounter Type": "Encounter Type",
+}
+
+DATE_PRESETS = [
+    "Last 30 Days",
+    "Current Week",
+    "Last 14 Days",
+    "Current Month",
+    "Current Quarter",
+    "Current Year",
+    "Custom Range",
+]
+
+
+def preset_range(option, today=None):
+    """Return the inclusive ``(start, end)`` dates for a preset, or ``None`` for a custom range."""
+    today = today or date.today()
+    if option == "Last 30 Days":
+        return today - timedelta(days=30), today
+    if option == "Current Week":
+        return today - timedelta(days=today.weekday()), today
+    if option == "Last 14 Days":
+        return today - timedelta(days=14), today
+    if option == "Current Month":
+        return today.replace(day=1), today
+    if option == "Current Quarter":
+        q = (today.month - 1) // 3 + 1
+        return date(today.year, 3 * (q - 1) + 1, 1), today
+    if option == "Current Year":
+        return date(today.year, 1, 1), today
+    return None
+
+
+def day_bounds(start, end):
+    """Nanosecond bounds ``[start 00:00, end + 1 day 00:00)`` for inclusive dates."""
+    lo = pd.Timestamp(start).normalize()
+    hi = pd.Timestamp(end).normalize() + pd.Timedelta(days=1)
+    return lo.value, hi.value
+
+
+class FilterIndex:
+    """Row positions for the sidebar filters, built once per dataset.
+
+    ``Visit Date`` is kept as a sorted array so a date range is two binary
+    searches, and each filter column keeps the row positions of every value
+    (a posting list) plus its sorted option list. :meth:`select` resolves
+    any combination of date range and multiselects to a single array of row
+    positions without copying the frame.
+    """
+
+    def __init__(self, df, date_column="Visit Date", columns=FILTER_COLUMNS):
+        self.size = len(df)
+        self._dtype = np.int32 if self.size < 2**31 else np.int64
+
+        if date_column in df.columns:
+            dates = df[date_column].to_numpy(dtype="datetime64[ns]").view("i8")
+            valid = np.flatnonzero(dates != np.iinfo(np.int64).min).astype(self._dtype)
+            self._date_order = valid[np.argsort(dates[valid], kind="stable")]
+            self._sorted_dates = dates[self._date_order]
+        else:
+            self._date_order = None
+            self._sorted_dates = None
+
+        self.options = {}
+        self._postings = {}
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True)
+            order = np.argsort(codes, kind="stable").astype(self._dtype)
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            order = order[len(codes) - counts.sum():]  # drop missing values (code -1)
+            values = list(np.asarray(uniques, dtype=object))
+            self.options[col] = values
+            self._postings[col] = dict(zip(values, np.split(order, np.cumsum(counts)[:-1])))
+
+    def date_positions(self, start, end):
+        """Row positions with ``start <= Visit Date < end + 1 day``, in date order."""
+        if self._sorted_dates is None:
+            return np.arange(self.size, dtype=self._dtype)
+        lo, hi = day_bounds(start, end)
+        left = np.searchsorted(self._sorted_dates, lo, side="left")
+        right = np.searchsorted(self._sorted_dates, hi, side="left")
+        return self._date_order[left:right]
+
+    def value_positions(self, column, values):
+        """Row positions holding any of ``values`` in ``column``."""
+        postings = self._postings.get(column, {})
+        parts = [postings[v] for v in values if v in postings]
+        if not parts:
+            return np.empty(0, dtype=self._dtype)
+        return np.concatenate(parts)
+
+    def select(self, start, end, selections):
+        """Resolve a date range and ``{column: selected values}`` to sorted row positions.
+
+        Empty selections and unknown columns are ignored, matching the
+        sidebar's "nothing selected means everything" behaviour.
+        """
+        with stage("filter.date") as fields:
+            rows = self.date_positions(start, end)
+            fields["rows"] = len(rows)
+        for col, values in selections.items():
+            if not values or col not in self._postings:
+                continue
+            with stage(f"filter.{col}", values=len(values)) as fields:
+                mask = np.zeros(self.size, dtype=bool)
+                mask[self.value_positions(col, values)] = True
+                rows = rows[mask[rows]]
+                fields["rows"] = len(rows)
+        return np.sort(rows)
@@ -0,0 +1,109 @@
+import logging
+import os
+import time
+from io import BytesIO
+from itertools import islice
+
+import pandas as pd
+
+from dashboard.schema import CATEGORY_COLUMNS, concat_frames, cpt_codes, to_amount
+
+logger = logging.getLogger(__name__)
+
+CHUNK_ROWS = int(os.environ.get("APP_DASH_CHUNK_ROWS", 50_000))
+
+DATE_COLUMNS = ["Visit Date", "Transaction Date"]
+AMOUNT_COLUMNS = ["Charge/Unit", "Expected"]
+
+
+def _header(row):
+    """Column names as ``pd.read_excel`` would give them: blanks named, duplicates numbered."""
+    names, seen = [], {}
+    for i, value in enumerate(row):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
+
+
+def coerce_chunk(chunk, sizes, categorical=True):
+    """Type one chunk as it arrives so only compact columns are kept around.
+
+    Dates become ``datetime64``, amounts numeric, ``CPT Code`` normalized text,
+    and (with ``categorical``) the low-cardinality text columns categoricals.
+    The object-dtype size of each converted column is added to ``sizes``
+    (``{column: bytes}``).
+    """
+    for col in DATE_COLUMNS:
+        if col in chunk.columns:
+            chunk[col] = pd.to_datetime(chunk[col], errors="coerce")
+    for col in AMOUNT_COLUMNS:
+        if col in chunk.columns:
+            chunk[col] = to_amount(chunk[col])
+    if "CPT Code" in chunk.columns:
+        chunk["CPT Code"] = cpt_codes(chunk["CPT Code"])
+    for col in CATEGORY_COLUMNS if categorical else []:
+        if col in chunk.columns:
+            sizes[col] = sizes.get(col, 0) + int(chunk[col].memory_usage(deep=True, index=False))
+            chunk[col] = chunk[col].astype("category")
+    return chunk
+
+
+def read_sheet(ws, chunk_rows=CHUNK_ROWS, report=None, categorical=True):
+    """Stream a read-only worksheet into a typed frame, ``chunk_rows`` rows at a time.
+
+    Entirely blank rows are skipped. ``report`` collects
+    ``(column, before_bytes, after_bytes)`` rows for the categorical columns.
+    """
+    start = time.perf_counter()
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    columns = _header(header)
+
+    sizes, chunks = {}, []
+    while True:
+        block = list(islice(rows, chunk_rows))
+        if not block:
+            break
+        block = [row for row in block if any(value is not None for value in row)]
+        if block:
+            chunk = pd.DataFrame.from_records(block, columns=columns, coerce_float=True)
+            chunks.append(coerce_chunk(chunk, sizes, categorical))
+
+    df = concat_frames(chunks) if chunks else pd.DataFrame(columns=columns)
+    # A column that was blank in some chunks comes back as object; retype it once.
+    df = df.infer_objects()
+    if report is not None:
+        report.extend((col, size, int(df[col].memory_usage(deep=True, index=False))) for col, size in sizes.items())
+    seconds = time.perf_counter() - start
+    logger.info(
+        f"Streamed {len(df)} rows from sheet {ws.title!r} in {seconds:.2f}s "
+        f"({len(df) / max(seconds, 1e-9):,.0f} rows/s, {len(chunks)} chunks)"
+    )
+    return df
+
+
+def parse_workbook(data, chunk_rows=CHUNK_ROWS, report=None):
+    """Read the main (first) sheet and the optional ``Sheet1`` CPT reference.
+
+    The workbook is opened read-only, so openpyxl streams each sheet's XML
+    instead of building its full cell model; see :func:`read_sheet`.
+    """
+    # Imported here: only a snapshot miss needs openpyxl.
+    from openpyxl import load_workbook
+
+    wb = load_workbook(BytesIO(data), read_only=True, data_only=True)
+    try:
+        df = read_sheet(wb.worksheets[0], chunk_rows, report)
+        cpt_ref = pd.DataFrame()
+        if "Sheet1" in wb.sheetnames:
+            cpt_ref = read_sheet(wb["Sheet1"], chunk_rows, categorical=False)
+    finally:
+        wb.close()
+    return df, cpt_ref
@@ -0,0 +1,95 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from dashboard.diagnostics import process_rss
+
+logger = logging.getLogger(__name__)
+
+STAGE_HISTORY = 500
+
+# Id of the Streamlit rerun being executed on this thread; set by begin_rerun().
+_rerun = contextvars.ContextVar("rerun", default=None)
+
+
+class StageStats:
+    """Recent timings per stage, shared by every session in the process."""
+
+    def __init__(self, maxlen=STAGE_HISTORY):
+        self.maxlen = maxlen
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, rss_delta, fields):
+        with self._lock:
+            samples = self._samples.setdefault(name, deque(maxlen=self.maxlen))
+            samples.append((seconds, rss_delta, fields.get("payload_bytes")))
+
+    def summary(self):
+        """p50/p95 wall time per stage, slowest p95 first."""
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        rows = []
+        for name, values in samples.items():
+            seconds = np.array([v[0] for v in values]) * 1000
+            payloads = [v[2] for v in values if v[2] is not None]
+            rows.append({
+                "Stage": name,
+                "Count": len(values),
+                "p50 (ms)": np.percentile(seconds, 50),
+                "p95 (ms)": np.percentile(seconds, 95),
+                "Max (ms)": seconds.max(),
+                "RSS Δ (MB)": np.mean([v[1] for v in values]) / 2**20,
+                "Payload (KB)": payloads[-1] / 1024 if payloads else None,
+            })
+        columns = ["Stage", "Count", "p50 (ms)", "p95 (ms)", "Max (ms)", "RSS Δ (MB)", "Payload (KB)"]
+        report = pd.DataFrame(rows, columns=columns)
+        return report.sort_values("p95 (ms)", ascending=False, ignore_index=True).round(2)
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+
+
+STAGES = StageStats()
+
+
+@contextmanager
+def stage(name, **fields):
+    """Time a block and log it as one JSON line; yields ``fields`` so the block can add to it.
+
+    Wall time and the change in process RSS are recorded in :data:`STAGES`.
+    """
+    rss = process_rss()
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        seconds = time.perf_counter() - start
+        rss_after = process_rss()
+        STAGES.record(name, seconds, rss_after - rss, fields)
+        logger.info(json.dumps({
+            "event": "stage",
+            "stage": name,
+            "rerun": _rerun.get(),
+            "ms": round(seconds * 1000, 3),
+            "rss_mb": round(rss_after / 2**20, 1),
+            "rss_delta_mb": round((rss_after - rss) / 2**20, 2),
+            **fields,
+        }, default=str))
+
+
+def begin_rerun(app):
+    """Tag the stages of the rerun starting on this thread; returns its id."""
+    rerun = uuid.uuid4().hex[:12]
+    _rerun.set(rerun)
+    logger.info(json.dumps({"event": "rerun", "app": app, "rerun": rerun}))
+    return rerun
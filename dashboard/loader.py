@@ -0,0 +1,324 @@
+import hashlib
+import logging
+import os
+import time
+import urllib.request
+from dataclasses import dataclass
+from functools import cached_property
+from io import BytesIO
+
+import pandas as pd
+
+from dashboard.cube import VisitCube
+from dashboard.episodes import PatientEpisodes
+from dashboard.filters import FilterIndex
+from dashboard.ingest import parse_workbook
+from dashboard.schema import (
+    add_periods,
+    compact_schema,
+    concat_frames,
+    cpt_category,
+    cpt_codes,
+    memory_report,
+)
+from dashboard.snapshot import SnapshotCache
+from dashboard.views import SortIndex
+
+logger = logging.getLogger(__name__)
+
+# -------------------- CONFIG --------------------
+FILE_ID = "1PlTbACUnIAOkTzM-m06j_lQvX62kiFKB"
+DEFAULT_SOURCE = os.environ.get(
+    "APP_DASH_SOURCE", f"https://drive.google.com/uc?id={FILE_ID}&export=download"
+)
+CACHE_DIR = os.environ.get("APP_DASH_CACHE_DIR", os.path.join(".cache", "app_dash"))
+# Seconds to wait on a plain HTTP source before the fetch/probe fails.
+HTTP_TIMEOUT = float(os.environ.get("APP_DASH_HTTP_TIMEOUT", 60))
+# Bump whenever the preprocessed layout changes so older snapshots are ignored.
+SCHEMA_VERSION = 4
+INCREMENTAL = os.environ.get("APP_DASH_INCREMENTAL", "1") != "0"
+
+# Every session shares one Dataset. With copy-on-write, frames derived from it
+# share its buffers and a write to one copies it first, so no session can
+# mutate the shared visits. Already the only mode on pandas 3.
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+
+@dataclass
+class Dataset:
+    """A fully preprocessed visit table plus how it was obtained."""
+
+    visits: pd.DataFrame
+    cpt_ref: pd.DataFrame
+    version: str
+    load_seconds: float
+    build_seconds: float
+    from_snapshot: bool = False
+    raw_columns: tuple = ()
+    cpt_ref_hash: int = 0
+    delta_rows: int = None
+    memory_rows: list = None
+    # Per-source load summaries when combined from a manifest; see dashboard.manifest.
+    parts: list = None
+
+    @property
+    def saved_seconds(self):
+        """Parse/preprocess time avoided by loading from a snapshot."""
+        if not self.from_snapshot:
+            return 0.0
+        return max(self.build_seconds - self.load_seconds, 0.0)
+
+    @cached_property
+    def nbytes(self):
+        """Deep memory footprint of :attr:`visits`, shared by all sessions."""
+        return int(self.visits.memory_usage(deep=True).sum())
+
+    @cached_property
+    def filter_index(self):
+        """Sidebar filter index over :attr:`visits`, built on first use."""
+        return FilterIndex(self.visits)
+
+    @cached_property
+    def cube(self):
+        """Pre-aggregated :class:`VisitCube` over :attr:`visits`, built on first use."""
+        return VisitCube(self.visits, filter_index=self.filter_index)
+
+    @cached_property
+    def episodes(self):
+        """Sorted per-patient E/M and CCM timelines, built on first use."""
+        return PatientEpisodes(self.visits)
+
+    @cached_property
+    def sort_index(self):
+        """Per-column global sort ranks for drill-down tables, built per column on first use."""
+        return SortIndex(self.visits)
+
+
+# -------------------- SOURCE --------------------
+def fetch_source(source):
+    """Return the raw workbook bytes from a local path, Drive link or plain URL."""
+    if os.path.exists(source):
+        with open(source, "rb") as f:
+            return f.read()
+    if "drive.google.com" in source:
+        import gdown
+
+        output = BytesIO()
+        gdown.download(source, output, quiet=True)
+        return output.getvalue()
+    with urllib.request.urlopen(source, timeout=HTTP_TIMEOUT) as response:
+        return response.read()
+
+
+def probe_source(source):
+    """Return a cheap change fingerprint for ``source`` without downloading it.
+
+    Local files are fingerprinted by size and mtime, plain HTTP sources by
+    their ``Content-Length``/``ETag``/``Last-Modified`` headers. ``None``
+    means no cheap fingerprint is available and the content hash decides.
+    """
+    if os.path.exists(source):
+        stat = os.stat(source)
+        return (stat.st_size, stat.st_mtime_ns)
+    if "drive.google.com" in source:
+        return None
+    try:
+        request = urllib.request.Request(source, method="HEAD")
+        with urllib.request.urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            headers = response.headers
+            stamp = tuple(headers.get(h) for h in ("Content-Length", "ETag", "Last-Modified"))
+    except Exception:
+        return None
+    return stamp if any(stamp) else None
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+# -------------------- PREPROCESS --------------------
+def preprocess(df, cpt_ref, report=None):
+    """Derive the date, lag and CPT fields every tab relies on.
+
+    ``Week``/``Month`` are integer period ordinals (format them with
+    :func:`dashboard.schema.period_labels`) and the low-cardinality text
+    columns are categoricals. Per-column memory savings are appended to
+    ``report`` when given.
+    """
+    report = [] if report is None else report
+    for col in ["Visit Date", "Transaction Date"]:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+
+    report.extend(add_periods(df))
+
+    if {"Visit Date", "Transaction Date"}.issubset(df.columns):
+        df["Encounter Lag"] = (df["Transaction Date"] - df["Visit Date"]).dt.days
+    else:
+        df["Encounter Lag"] = pd.NA
+
+    if "CPT Code" in df.columns:
+        if not isinstance(df["CPT Code"].dtype, pd.CategoricalDtype):
+            df["CPT Code"] = cpt_codes(df["CPT Code"])
+        df["CPT Category"] = cpt_category(df["CPT Code"])
+    else:
+        df["CPT Code"] = pd.NA
+        df["CPT Category"] = pd.NA
+
+    if not cpt_ref.empty and "CPT Code" in cpt_ref.columns:
+        # Match the key's dtype so a categorical CPT Code survives the merge.
+        cpt_ref = cpt_ref.astype({"CPT Code": df["CPT Code"].dtype})
+        df = df.merge(cpt_ref, on="CPT Code", how="left")
+
+    report.extend(compact_schema(df))
+    return df
+
+
+# -------------------- INCREMENTAL --------------------
+ROW_HASH = "_row_hash"
+
+
+def frame_hash(df):
+    """64-bit fingerprint of a frame's contents."""
+    if df.empty:
+        return 0
+    return int(pd.util.hash_pandas_object(df, index=False).sum())
+
+
+def add_row_keys(raw):
+    """Attach a content hash per raw row and make sure every row has a stable ``Visit ID``.
+
+    Workbooks without a ``Visit ID`` column get one derived from the row's
+    content (plus its occurrence number, so identical rows stay distinct)
+    instead of its position, so keys survive rows being appended or
+    reordered.
+    """
+    row_hash = pd.util.hash_pandas_object(raw, index=False).to_numpy()
+    raw[ROW_HASH] = row_hash
+    if "Visit ID" not in raw.columns:
+        occurrence = raw.groupby(ROW_HASH, sort=False).cumcount().to_numpy()
+        keys = pd.DataFrame({"hash": row_hash, "occurrence": occurrence})
+        raw.insert(0, "Visit ID", pd.util.hash_pandas_object(keys, index=False).to_numpy())
+    return raw
+
+
+def upsert(previous, raw, cpt_ref):
+    """Merge freshly parsed ``raw`` rows into the preprocessed ``previous`` frame.
+
+    Rows are matched on ``(Visit ID, row hash)``: unchanged rows are reused
+    as-is, new or corrected rows are preprocessed, and rows that disappeared
+    from the source are dropped. Returns ``(visits, delta_rows)``.
+    """
+    new_pairs = pd.MultiIndex.from_arrays([raw["Visit ID"], raw[ROW_HASH]])
+    old_pairs = pd.MultiIndex.from_arrays([previous["Visit ID"], previous[ROW_HASH]])
+    keep = old_pairs.isin(new_pairs)
+    delta = ~new_pairs.isin(old_pairs)
+
+    changed = preprocess(raw[delta].copy(), cpt_ref)
+    visits = concat_frames([previous[keep], changed])[previous.columns]
+    compact_schema(visits)
+    return visits, int(delta.sum())
+
+
+# -------------------- LOAD --------------------
+def load_dataset(source=DEFAULT_SOURCE, cache_dir=CACHE_DIR, previous=None):
+    """Fetch ``source`` and return its preprocessed :class:`Dataset`."""
+    start = time.perf_counter()
+    data = fetch_source(source)
+    return build_dataset(data, cache_dir=cache_dir, previous=previous, started=start)
+
+
+def build_dataset(data, cache_dir=CACHE_DIR, previous=None, incremental=INCREMENTAL, started=None):
+    """Turn raw workbook bytes into a preprocessed :class:`Dataset`.
+
+    The preprocessed frame is snapshotted to ``cache_dir`` keyed by the
+    workbook's content hash, so a restart with an unchanged source skips the
+    openpyxl parse and preprocessing entirely. Pass ``cache_dir=None`` to
+    always rebuild.
+
+    On a snapshot miss with ``incremental`` enabled, rows are upserted by
+    ``Visit ID`` into ``previous`` (or the most recent snapshot) so only new
+    and corrected rows go through preprocessing. A changed CPT reference or
+    column layout falls back to a full rebuild.
+    """
+    start = time.perf_counter() if started is None else started
+    version = content_hash(data)
+
+    cache = SnapshotCache(os.path.join(cache_dir, f"v{SCHEMA_VERSION}")) if cache_dir else None
+    if cache is not None:
+        hit = cache.load(version)
+        if hit is not None:
+            visits, cpt_ref, meta = hit
+            dataset = Dataset(
+                visits=visits,
+                cpt_ref=cpt_ref,
+                version=version,
+                load_seconds=time.perf_counter() - start,
+                build_seconds=meta["build_seconds"],
+                from_snapshot=True,
+                raw_columns=tuple(meta.get("raw_columns", ())),
+                cpt_ref_hash=meta.get("cpt_ref_hash", 0),
+                memory_rows=meta.get("memory_rows"),
+            )
+            logger.info(
+                f"Loaded snapshot {version[:12]} ({len(visits)} rows) in {dataset.load_seconds:.2f}s, "
+                f"saved {dataset.saved_seconds:.2f}s"
+            )
+            return dataset
+
+    ingest_rows = []
+    df, cpt_ref = parse_workbook(data, report=ingest_rows)
+    raw_columns = tuple(df.columns)
+    cpt_ref_hash = frame_hash(cpt_ref)
+    df = add_row_keys(df)
+
+    if incremental and previous is None and cache is not None:
+        latest = cache.latest()
+        if latest is not None:
+            visits, _, meta = latest
+            previous = Dataset(
+                visits=visits,
+                cpt_ref=pd.DataFrame(),
+                version=meta["key"],
+                load_seconds=0.0,
+                build_seconds=meta["build_seconds"],
+                raw_columns=tuple(meta.get("raw_columns", ())),
+                cpt_ref_hash=meta.get("cpt_ref_hash", 0),
+            )
+
+    delta_rows = None
+    memory_rows = None
+    if (
+        incremental
+        and previous is not None
+        and previous.raw_columns == raw_columns
+        and previous.cpt_ref_hash == cpt_ref_hash
+        and ROW_HASH in previous.visits.columns
+    ):
+        visits, delta_rows = upsert(previous.visits, df, cpt_ref)
+        memory_rows = previous.memory_rows
+        logger.info(f"Upserted {delta_rows} new/changed of {len(df)} rows onto {previous.version[:12]}")
+    else:
+        memory_rows = ingest_rows
+        visits = preprocess(df, cpt_ref, report=memory_rows)
+        logger.info(f"Compact schema memory report:\n{memory_report(memory_rows).to_string(index=False)}")
+
+    build_seconds = time.perf_counter() - start
+    if cache is not None:
+        cache.save(
+            version, visits, cpt_ref, build_seconds,
+            raw_columns=list(raw_columns), cpt_ref_hash=cpt_ref_hash, memory_rows=memory_rows,
+        )
+    logger.info(f"Built dataset {version[:12]} ({len(visits)} rows) in {build_seconds:.2f}s")
+    return Dataset(
+        visits=visits,
+        cpt_ref=cpt_ref,
+        version=version,
+        load_seconds=build_seconds,
+        build_seconds=build_seconds,
+        raw_columns=raw_columns,
+        cpt_ref_hash=cpt_ref_hash,
+        delta_rows=delta_rows,
+        memory_rows=memory_rows,
+    )
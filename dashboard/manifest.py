@@ -0,0 +1,205 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import pandas as pd
+
+from dashboard.loader import (
+    CACHE_DIR,
+    DEFAULT_SOURCE,
+    SCHEMA_VERSION,
+    Dataset,
+    build_dataset,
+    fetch_source,
+    probe_source,
+)
+from dashboard.schema import compact_schema, concat_frames
+from dashboard.snapshot import SnapshotCache
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated sources and/or a file listing one source per line ("#" starts a comment).
+SOURCES_ENV = os.environ.get("APP_DASH_SOURCES", "")
+MANIFEST_FILE = os.environ.get("APP_DASH_MANIFEST", "")
+LOAD_WORKERS = int(os.environ.get("APP_DASH_LOAD_WORKERS", os.cpu_count() or 1))
+
+
+def resolve_source(entry):
+    """Turn a manifest entry (local path, URL or bare Drive file ID) into a source."""
+    entry = entry.strip()
+    if os.path.exists(entry) or "://" in entry:
+        return entry
+    return f"https://drive.google.com/uc?id={entry}&export=download"
+
+
+def read_manifest(path):
+    """Sources listed in a manifest file, one per line."""
+    with open(path) as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [resolve_source(line) for line in lines if line]
+
+
+def configured_sources():
+    """Sources from ``APP_DASH_SOURCES``/``APP_DASH_MANIFEST``, else the single default."""
+    sources = [resolve_source(entry) for entry in SOURCES_ENV.split(",") if entry.strip()]
+    if MANIFEST_FILE:
+        sources += read_manifest(MANIFEST_FILE)
+    return list(dict.fromkeys(sources)) or [DEFAULT_SOURCE]
+
+
+SOURCES = configured_sources()
+
+
+def probe_sources(sources):
+    """Combined change fingerprint, or ``None`` if any source has no cheap fingerprint."""
+    fingerprints = [probe_source(source) for source in sources]
+    return None if any(fp is None for fp in fingerprints) else fingerprints
+
+
+@dataclass
+class PartResult:
+    """Outcome of loading one manifest source."""
+
+    source: str
+    dataset: Dataset = None
+    seconds: float = 0.0
+    error: str = None
+
+    def summary(self):
+        return {
+            "source": self.source,
+            "rows": len(self.dataset.visits) if self.dataset is not None else 0,
+            "seconds": round(self.seconds, 3),
+            "from_snapshot": self.dataset.from_snapshot if self.dataset is not None else False,
+            "error": self.error,
+            # Failed, but its last good snapshot is served in its place.
+            "stale": self.error is not None and self.dataset is not None,
+        }
+
+
+def part_dir(source, cache_dir=CACHE_DIR):
+    """Where one source keeps its own snapshots, or ``None`` without a cache."""
+    return os.path.join(cache_dir, "parts", hashlib.sha1(source.encode()).hexdigest()[:16]) if cache_dir else None
+
+
+def last_good(source, cache_dir=CACHE_DIR):
+    """The most recent snapshot built for ``source`` as a :class:`Dataset`, or ``None``."""
+    root = part_dir(source, cache_dir)
+    hit = SnapshotCache(os.path.join(root, f"v{SCHEMA_VERSION}")).latest() if root else None
+    if hit is None:
+        return None
+    visits, cpt_ref, meta = hit
+    return Dataset(
+        visits=visits,
+        cpt_ref=cpt_ref,
+        version=meta["key"],
+        load_seconds=0.0,
+        build_seconds=meta["build_seconds"],
+        from_snapshot=True,
+        raw_columns=tuple(meta.get("raw_columns", ())),
+        cpt_ref_hash=meta.get("cpt_ref_hash", 0),
+        memory_rows=meta.get("memory_rows"),
+    )
+
+
+def failed_part(source, error, cache_dir=CACHE_DIR, seconds=0.0):
+    """Result for a source that could not be loaded, keeping its last good rows if any.
+
+    A transient failure then leaves that source's rows in the combined
+    dataset instead of dropping them until the next successful refresh.
+    """
+    dataset = last_good(source, cache_dir)
+    if dataset is not None:
+        logger.warning(f"Serving the last good snapshot of {source} ({len(dataset.visits)} rows)")
+    return PartResult(source, dataset, seconds, error=f"{type(error).__name__}: {error}")
+
+
+def load_part(source, cache_dir=CACHE_DIR):
+    """Fetch and preprocess one source; errors are returned, never raised."""
+    start = time.perf_counter()
+    try:
+        data = fetch_source(source)
+        # Each source keeps its own snapshots, so unchanged files are never re-parsed
+        # and a changed one is upserted onto its own previous version.
+        dataset = build_dataset(data, cache_dir=part_dir(source, cache_dir), started=start)
+        return PartResult(source, dataset, time.perf_counter() - start)
+    except Exception as e:
+        logger.exception(f"Could not load {source}")
+        return failed_part(source, e, cache_dir, time.perf_counter() - start)
+
+
+def load_parts(sources, cache_dir=CACHE_DIR, max_workers=LOAD_WORKERS):
+    """Load every source, in parallel worker processes when there is more than one."""
+    workers = min(max_workers, len(sources))
+    if workers <= 1:
+        return [load_part(source, cache_dir) for source in sources]
+
+    # "spawn" rather than fork: the Streamlit server process runs threads.
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        futures = [pool.submit(load_part, source, cache_dir) for source in sources]
+        results = []
+        for source, future in zip(sources, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # The worker itself died (e.g. out of memory); other parts still count.
+                logger.exception(f"Worker loading {source} failed")
+                results.append(failed_part(source, e, cache_dir))
+    return results
+
+
+def combine_parts(results, started=None):
+    """Concatenate the loaded parts into one :class:`Dataset` with a consistent schema."""
+    start = time.perf_counter() if started is None else started
+    loaded = [r for r in results if r.dataset is not None]
+    if not loaded:
+        errors = "; ".join(f"{r.source}: {r.error}" for r in results)
+        raise RuntimeError(f"No source could be loaded ({errors})")
+
+    visits = concat_frames([r.dataset.visits for r in loaded])
+    compact_schema(visits)
+    cpt_refs = [r.dataset.cpt_ref for r in loaded if not r.dataset.cpt_ref.empty]
+    cpt_ref = pd.concat(cpt_refs, ignore_index=True) if cpt_refs else pd.DataFrame()
+    if "CPT Code" in cpt_ref.columns:
+        cpt_ref = cpt_ref.drop_duplicates("CPT Code", keep="last", ignore_index=True)
+
+    memory = {}
+    for r in loaded:
+        for col, before, after in r.dataset.memory_rows or []:
+            sums = memory.setdefault(col, [0, 0])
+            sums[0] += before
+            sums[1] += after
+
+    version = hashlib.sha256("".join(r.dataset.version for r in loaded).encode()).hexdigest()
+    return Dataset(
+        visits=visits,
+        cpt_ref=cpt_ref,
+        version=version,
+        load_seconds=time.perf_counter() - start,
+        build_seconds=sum(r.dataset.build_seconds for r in loaded),
+        from_snapshot=all(r.dataset.from_snapshot for r in loaded),
+        raw_columns=tuple(dict.fromkeys(c for r in loaded for c in r.dataset.raw_columns)),
+        memory_rows=[(col, before, after) for col, (before, after) in memory.items()],
+        parts=[r.summary() for r in results],
+    )
+
+
+def load_sources(sources, cache_dir=CACHE_DIR, max_workers=LOAD_WORKERS, started=None):
+    """Load and combine all ``sources``; failed ones are reported in ``Dataset.parts``."""
+    start = time.perf_counter() if started is None else started
+    results = load_parts(sources, cache_dir, max_workers)
+    for r in results:
+        if r.error is None:
+            logger.info(f"Loaded {r.source} ({len(r.dataset.visits)} rows) in {r.seconds:.2f}s")
+    dataset = combine_parts(results, started=start)
+    failed = sum(r.error is not None for r in results)
+    logger.info(
+        f"Combined {len(results) - failed}/{len(results)} sources ({len(dataset.visits)} rows) "
+        f"in {dataset.load_seconds:.2f}s"
+    )
+    return dataset
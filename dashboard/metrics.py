@@ -0,0 +1,242 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import pandas as pd
+
+from dashboard.episodes import DEFAULT_PAIRING, delay_by_facility
+from dashboard.instrumentation import stage
+from dashboard.schema import period_labels
+from dashboard.views import VisitView
+
+METRIC_CACHE_SIZE = int(os.environ.get("APP_DASH_METRIC_CACHE_SIZE", 256))
+# Row selections cost 4 bytes per selected visit, so the entry cap alone is no bound at scale.
+METRIC_CACHE_MB = float(os.environ.get("APP_DASH_METRIC_CACHE_MB", 512))
+
+VISIT_TARGET = 120
+
+
+@dataclass(frozen=True)
+class FilterState:
+    """Normalized, hashable sidebar state: an inclusive date range plus multiselects."""
+
+    start: object
+    end: object
+    selections: tuple = ()
+
+    @classmethod
+    def create(cls, start, end, selections):
+        """Build a state whose equality ignores selection order and empty filters."""
+        normalized = tuple(
+            (col, tuple(sorted(values, key=str)))
+            for col, values in sorted(selections.items())
+            if values
+        )
+        return cls(pd.Timestamp(start).date(), pd.Timestamp(end).date(), normalized)
+
+    def as_dict(self):
+        return {col: list(values) for col, values in self.selections}
+
+
+def approx_nbytes(value):
+    """Rough memory held by a cached value; views count their row positions, not the shared table."""
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    nbytes = getattr(value, "nbytes", None)
+    return nbytes if isinstance(nbytes, int) else sys.getsizeof(value)
+
+
+class MetricCache:
+    """Bounded LRU of computed metrics, shared by every session in the process.
+
+    Keys are ``(dataset version, filter state, metric name)``, so entries for
+    a replaced dataset simply age out. The oldest entries are evicted once
+    there are more than ``maxsize`` of them or they hold more than
+    ``maxbytes`` (see :func:`approx_nbytes`).
+    """
+
+    def __init__(self, maxsize=METRIC_CACHE_SIZE, maxbytes=int(METRIC_CACHE_MB * 2**20)):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+        # Computed outside the lock: metrics depend on other cached metrics.
+        value = compute()
+        size = approx_nbytes(value)
+        with self._lock:
+            self.misses += 1
+            self.nbytes += size - self._sizes.get(key, 0)
+            self._data[key] = value
+            self._sizes[key] = size
+            self._data.move_to_end(key)
+            # Always keep the newest entry, even if it alone is over budget.
+            while len(self._data) > 1 and (len(self._data) > self.maxsize or self.nbytes > self.maxbytes):
+                old_key, _ = self._data.popitem(last=False)
+                self.nbytes -= self._sizes.pop(old_key)
+        return value
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "nbytes": self.nbytes,
+                "maxbytes": self.maxbytes,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.hits = self.misses = self.nbytes = 0
+
+
+METRIC_CACHE = MetricCache()
+
+# name -> function(dataset, state, **params); see metric().
+METRICS = {}
+# name -> the extra parameters the metric takes, with their defaults.
+METRIC_PARAMS = {}
+
+
+def metric(name, **params):
+    """Register ``fn(dataset, state, **params)`` as a named, independently cached metric.
+
+    ``params`` (with defaults) are options beyond the filter state that only
+    this metric depends on, such as the CCM pairing rule.
+    """
+    def register(fn):
+        METRICS[name] = fn
+        METRIC_PARAMS[name] = params
+        return fn
+    return register
+
+
+def compute(name, dataset, state, cache=METRIC_CACHE, **params):
+    """Return metric ``name`` for ``state``, computing it only on a cache miss.
+
+    ``params`` the metric doesn't take are ignored, so they only enter the
+    cache key of the metrics they affect.
+    """
+    params = {key: params.get(key, default) for key, default in METRIC_PARAMS[name].items()}
+    key = name + "".join(f":{value}" for value in params.values())
+
+    def run():
+        with stage(f"metric.{name}"):
+            return METRICS[name](dataset, state, **params)
+    return cache.get_or_compute((dataset.version, state, key), run)
+
+
+# -------------------- SELECTION --------------------
+@metric("selection.rows")
+def selected_rows(dataset, state):
+    return dataset.filter_index.select(state.start, state.end, state.as_dict())
+
+
+@metric("selection.view")
+def selected_view(dataset, state):
+    return VisitView(dataset.visits, compute("selection.rows", dataset, state))
+
+
+@metric("selection.cube")
+def selected_cube(dataset, state):
+    # Without a materialized cube the rollups read the selected rows, already cached.
+    rows = None if dataset.cube.materialized else compute("selection.rows", dataset, state)
+    return dataset.cube.select(state.start, state.end, state.as_dict(), rows=rows)
+
+
+def _with_labels(df, column):
+    df[column] = period_labels(df[column], column)
+    return df
+
+
+# -------------------- EXECUTIVE --------------------
+@metric("executive.provider_weekly")
+def provider_weekly(dataset, state):
+    cube = compute("selection.cube", dataset, state)
+    weekly = _with_labels(cube.count(["Provider Name", "Week"], name="Visit Count"), "Week")
+    weekly["% to Target"] = (weekly["Visit Count"] / VISIT_TARGET) * 100
+    return weekly
+
+
+# -------------------- OPERATIONS --------------------
+@metric("operations.facility_monthly")
+def facility_monthly(dataset, state):
+    cube = compute("selection.cube", dataset, state)
+    monthly = _with_labels(cube.count(["Facility Name", "Month"], name="Visit Count"), "Month")
+    monthly["% to Target"] = (monthly["Visit Count"] / VISIT_TARGET) * 100
+    return monthly
+
+
+@metric("operations.facility_ramp")
+def facility_ramp(dataset, state):
+    cube = compute("selection.cube", dataset, state)
+    ramp = _with_labels(cube.count(["Facility Name", "Week"], name="Visit Count"), "Week")
+    ramp["% Ramp"] = (ramp["Visit Count"] / VISIT_TARGET) * 100
+    return ramp
+
+
+@metric("operations.provider_working_days")
+def provider_working_days(dataset, state):
+    cube = compute("selection.cube", dataset, state)
+    return _with_labels(cube.working_days(["Provider Name", "Month"]), "Month")
+
+
+# -------------------- GROWTH --------------------
+@metric("growth.ccm_delays", pairing=DEFAULT_PAIRING)
+def ccm_delays(dataset, state, pairing):
+    return dataset.episodes.delays(compute("selection.view", dataset, state).rows, pairing)
+
+
+@metric("growth.ccm_delay_by_facility", pairing=DEFAULT_PAIRING)
+def ccm_delay_by_facility(dataset, state, pairing):
+    return delay_by_facility(compute("growth.ccm_delays", dataset, state, pairing=pairing))
+
+
+# -------------------- QUALITY --------------------
+@metric("quality.provider_lag")
+def provider_lag(dataset, state):
+    cube = compute("selection.cube", dataset, state)
+    return _with_labels(cube.mean_lag(["Provider Name", "Week"]), "Week")
+
+
+@metric("quality.cpt_initial")
+def cpt_initial(dataset, state):
+    cube = compute("selection.cube", dataset, state)
+    return cube.where("CPT Category", "Initial").count(["Provider Name"], name="Count")
+
+
+@metric("quality.cpt_follow_up")
+def cpt_follow_up(dataset, state):
+    cube = compute("selection.cube", dataset, state)
+    return cube.where("CPT Category", "Follow-up").count(["Provider Name"], name="Count")
+
+
+# Metrics behind each dashboard tab, in render order; only the visible tab's are computed.
+TAB_METRICS = {
+    "Executive": ["executive.provider_weekly"],
+    "Operations": [
+        "operations.facility_monthly",
+        "operations.facility_ramp",
+        "operations.provider_working_days",
+    ],
+    "Growth": ["growth.ccm_delay_by_facility"],
+    "Quality": ["quality.provider_lag", "quality.cpt_initial", "quality.cpt_follow_up"],
+}
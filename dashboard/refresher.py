@@ -0,0 +1,200 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from dashboard.arrow_store import ArrowStore
+from dashboard.loader import CACHE_DIR, SCHEMA_VERSION, build_dataset, content_hash, fetch_source, probe_source
+from dashboard.manifest import load_sources, probe_sources
+
+logger = logging.getLogger(__name__)
+
+REFRESH_SECONDS = float(os.environ.get("APP_DASH_REFRESH_SECONDS", 15 * 60))
+
+
+class BackgroundRefresher:
+    """Serve the current dataset while a worker thread watches the source.
+
+    Readers always get the last fully built dataset from :meth:`current`.
+    Every ``interval`` seconds the worker checks whether the source changed
+    (cheap fingerprint first, then content hash) and only rebuilds when it
+    did; the new dataset is swapped in with a single reference assignment,
+    so a reader never sees a half-built frame.
+
+    ``source`` may also be a list of sources (see :mod:`dashboard.manifest`);
+    they are loaded in parallel and combined into one dataset.
+
+    Server processes sharing ``cache_dir`` coordinate through an
+    :class:`~dashboard.arrow_store.ArrowStore`: only the process holding its
+    lock checks and rebuilds, and every process attaches to the published
+    generation instead of parsing the workbook itself.
+    """
+
+    def __init__(self, source, interval=REFRESH_SECONDS, cache_dir=CACHE_DIR):
+        self.source = source
+        self.sources = [source] if isinstance(source, str) else list(source)
+        self.interval = interval
+        self.cache_dir = cache_dir
+        self.store = None
+        if cache_dir:
+            # One store per source, so refreshers for different workbooks never share generations.
+            source_key = hashlib.sha1(json.dumps(source).encode()).hexdigest()[:16]
+            self.store = ArrowStore(os.path.join(cache_dir, f"v{SCHEMA_VERSION}", "shared", source_key))
+        self._dataset = None
+        self._generation = 0
+        self._fingerprint = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.last_checked = None
+        self.last_refresh = None
+        self.last_duration = None
+        self.last_error = None
+
+    @property
+    def loaded(self):
+        """Whether a dataset is already in memory, i.e. :meth:`current` won't block."""
+        return self._dataset is not None
+
+    def current(self):
+        """Return the current dataset, loading it synchronously the first time."""
+        if self._dataset is None:
+            self.refresh()
+        return self._dataset
+
+    def refresh(self):
+        """Pick up a newer generation or check the source once. Returns True on swap."""
+        with self._refresh_lock:
+            start = time.perf_counter()
+            if self.store is None:
+                return self._rebuild(start)
+            if self._attach_newer(start):
+                return True
+            # Only the first load waits for another process's build.
+            with self.store.lock(blocking=self._dataset is None) as acquired:
+                if not acquired:
+                    return False
+                if self._attach_newer(start):
+                    return True
+                info = self.store.current()
+                if self._dataset is not None and info and time.time() - info["checked"] < self.interval:
+                    # Another process checked the source recently.
+                    return False
+                return self._rebuild(start)
+
+    def _attach_newer(self, start):
+        info = self.store.current()
+        if info is None or info["generation"] <= self._generation:
+            return False
+        try:
+            dataset = self.store.attach(info, started=start)
+        except FileNotFoundError:
+            # Pruned between reading CURRENT and mapping it; a newer one exists.
+            return False
+        self._swap(dataset, start, info["fingerprint"], info["generation"])
+        return True
+
+    def _unchanged(self, fingerprint):
+        self._fingerprint = fingerprint
+        if self.store is not None:
+            self.store.mark_checked(fingerprint)
+        return False
+
+    def _rebuild(self, start):
+        error = None
+        if len(self.sources) == 1:
+            fingerprint = probe_source(self.sources[0])
+        else:
+            fingerprint = probe_sources(self.sources)
+        # Round-trip through JSON so it compares equal to a published fingerprint.
+        fingerprint = json.loads(json.dumps(fingerprint))
+        self.last_checked = datetime.now()
+        if self._dataset is not None and fingerprint is not None and fingerprint == self._fingerprint:
+            return self._unchanged(fingerprint)
+
+        if len(self.sources) == 1:
+            data = fetch_source(self.sources[0])
+            if self._dataset is not None and content_hash(data) == self._dataset.version:
+                return self._unchanged(fingerprint)
+            dataset = build_dataset(data, cache_dir=self.cache_dir, previous=self._dataset, started=start)
+        else:
+            # Unchanged parts come straight from their snapshots.
+            dataset = load_sources(self.sources, cache_dir=self.cache_dir, started=start)
+            failed = [f"{part['source']}: {part['error']}" for part in dataset.parts or [] if part["error"]]
+            if failed:
+                # Don't remember the fingerprint, so the next check retries the failed parts.
+                fingerprint = None
+                error = RuntimeError(f"{len(failed)} of {len(self.sources)} sources failed ({'; '.join(failed)})")
+            if self._dataset is not None and dataset.version == self._dataset.version:
+                # Failed parts served from their last good snapshots leave the data as it was.
+                self.last_error = error
+                return self._unchanged(fingerprint)
+        generation = self._generation
+        if self.store is not None:
+            info = self.store.publish(dataset, fingerprint)
+            # Serve the mapped copy too, so this process shares the page cache.
+            dataset = self.store.attach(info, started=start)
+            dataset.load_seconds = time.perf_counter() - start
+            dataset.from_snapshot = False
+            generation = info["generation"]
+        self._swap(dataset, start, fingerprint, generation, error)
+        return True
+
+    def _swap(self, dataset, start, fingerprint, generation, error=None):
+        # Build per-dataset indexes before the swap so no reader pays for them.
+        dataset.filter_index
+        dataset.cube
+        dataset.episodes
+        self._dataset = dataset
+        self._fingerprint = fingerprint
+        self._generation = generation
+        self.last_refresh = datetime.now()
+        self.last_duration = time.perf_counter() - start
+        self.last_error = error
+        logger.info(f"Swapped in dataset {dataset.version[:12]} after {self.last_duration:.2f}s")
+
+    def start(self):
+        """Start the background worker (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="dataset-refresher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the previous dataset; the error is surfaced in the UI.
+                self.last_error = e
+                logger.exception(f"Background refresh of {self.source} failed")
+
+
+_REFRESHERS = {}
+_REFRESHERS_LOCK = threading.Lock()
+
+
+def shared_refresher(source):
+    """The process-wide, started refresher for ``source``, created on first use.
+
+    Both dashboards and the ``app.py`` prewarm share it, so a dataset loaded
+    before the first visitor is the one that visitor gets.
+    """
+    if not isinstance(source, str):
+        source = tuple(source)
+    with _REFRESHERS_LOCK:
+        refresher = _REFRESHERS.get(source)
+        if refresher is None:
+            refresher = _REFRESHERS[source] = BackgroundRefresher(source)
+            refresher.start()
+        return refresher
@@ -0,0 +1,171 @@
+import sys
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+EM_INITIAL_CODES = {"99304", "99305", "99306"}
+EM_FOLLOW_UP_CODES = {"99307", "99308", "99309", "99310"}
+EM_CODES = EM_INITIAL_CODES | EM_FOLLOW_UP_CODES
+CCM_CODE = "99487"
+
+# Low-cardinality text columns stored as categoricals.
+CATEGORY_COLUMNS = [
+    "Provider Name",
+    "Facility Name",
+    "State",
+    "Payer Class",
+    "Encounter Type",
+    "CPT Code",
+    "CPT Category",
+]
+
+CPT_CATEGORIES = ["Follow-up", "Initial", "Other"]
+
+# Period columns stored as integer ordinals and only formatted at chart time.
+PERIOD_FREQS = {"Week": "W", "Month": "M"}
+
+
+def period_ordinals(dates, freq):
+    """Integer period ordinals (nullable ``Int64``) for a datetime Series."""
+    periods = dates.dt.to_period(freq)
+    return pd.Series(
+        pd.arrays.IntegerArray(periods.array.asi8.copy(), periods.isna().to_numpy()),
+        index=dates.index,
+    )
+
+
+def period_labels(ordinals, freq):
+    """Format period ordinals as the labels ``Period.astype(str)`` would give.
+
+    Only the distinct ordinals are formatted, so this is cheap on an
+    aggregated frame.
+    """
+    freq = PERIOD_FREQS.get(freq, freq)
+    ordinals = pd.Series(ordinals)
+    labels = {o: str(pd.Period(ordinal=int(o), freq=freq)) for o in ordinals.dropna().unique()}
+    return ordinals.map(labels)
+
+
+def label_periods(df):
+    """Replace ``df``'s period ordinal columns with their labels, for display or export."""
+    for col in PERIOD_FREQS:
+        if col in df.columns:
+            df[col] = period_labels(df[col], col)
+    return df
+
+
+def _label_bytes(ordinals, freq):
+    """Deep size the ordinals would take as an object column of period labels."""
+    counts = ordinals.value_counts(dropna=False)
+    labels = period_labels(counts.index.to_series(), freq).fillna("NaT")
+    return int(8 * len(ordinals) + sum(sys.getsizeof(label) * n for label, n in zip(labels, counts)))
+
+
+def cpt_codes(values):
+    """CPT codes as stripped text, with numeric cells written without a trailing ``.0``.
+
+    Excel stores most codes as numbers, and a single blank cell makes pandas
+    read them all as floats; normalizing here keeps ``99304`` the same code
+    however the surrounding rows were typed. Text cells (e.g. ``"00100"``)
+    are only stripped, and blanks stay missing.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        numeric = values
+    else:
+        numeric = pd.to_numeric(values.where(~values.map(type).eq(str)), errors="coerce")
+    integral = (numeric.notna() & (numeric % 1 == 0)).to_numpy()
+    codes = values.astype(object).where(values.notna())
+    text = codes.notna().to_numpy() & ~integral
+    codes[text] = codes[text].astype(str).str.strip()
+    codes[integral] = numeric[integral].astype("int64").astype(str)
+    return codes
+
+
+def cpt_category(codes):
+    """Categorical ``Initial``/``Follow-up``/``Other`` for a Series of CPT codes."""
+    is_initial = codes.isin(EM_INITIAL_CODES).to_numpy()
+    is_follow_up = codes.isin(EM_FOLLOW_UP_CODES).to_numpy()
+    category = np.select([is_follow_up, is_initial], [0, 1], 2).astype(np.int8)
+    return pd.Series(pd.Categorical.from_codes(category, CPT_CATEGORIES), index=codes.index)
+
+
+def to_amount(values):
+    """Parse money values such as ``"$1,200"`` to floats; unparseable ones become NaN.
+
+    Numbers pass straight through and only the text values are cleaned.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        return values
+    amounts = pd.to_numeric(values, errors="coerce")
+    text = amounts.isna() & values.notna()
+    if text.any():
+        values = values.copy()
+        values[text] = values[text].astype(str).str.replace("$", "", regex=False).str.replace(",", "", regex=False)
+        amounts = pd.to_numeric(values, errors="coerce")
+    return amounts
+
+
+def compact_schema(df):
+    """Convert the known low-cardinality columns to categoricals in place.
+
+    Returns a list of ``(column, before_bytes, after_bytes)`` for the columns
+    that were converted.
+    """
+    report = []
+    for col in CATEGORY_COLUMNS:
+        if col not in df.columns or isinstance(df[col].dtype, pd.CategoricalDtype):
+            continue
+        before = int(df[col].memory_usage(deep=True, index=False))
+        df[col] = df[col].astype("category")
+        report.append((col, before, int(df[col].memory_usage(deep=True, index=False))))
+    return report
+
+
+def add_periods(df, source="Visit Date"):
+    """Add ``Week``/``Month`` ordinal columns; returns their memory report rows."""
+    report = []
+    for col, freq in PERIOD_FREQS.items():
+        if source in df.columns:
+            df[col] = period_ordinals(df[source], freq)
+            before = _label_bytes(df[col], freq)
+        else:
+            df[col] = pd.array([pd.NA] * len(df), dtype="Int64")
+            before = 8 * len(df)
+        report.append((col, before, int(df[col].memory_usage(index=False))))
+    return report
+
+
+def memory_report(rows):
+    """Tabulate ``(column, before_bytes, after_bytes)`` rows for display or logging."""
+    report = pd.DataFrame(rows, columns=["Column", "Before (bytes)", "After (bytes)"])
+    report["Saved (%)"] = np.where(
+        report["Before (bytes)"] > 0,
+        (1 - report["After (bytes)"] / report["Before (bytes)"].clip(lower=1)) * 100,
+        0.0,
+    ).round(1)
+    return report
+
+
+def concat_frames(frames):
+    """Concatenate frames while keeping categorical columns categorical.
+
+    ``pd.concat`` falls back to object dtype when categories differ, which
+    would undo :func:`compact_schema`; here categories are unioned instead,
+    kept sorted so option lists and ``sort=True`` groupbys stay alphabetical.
+    """
+    frames = [f for f in frames if len(f.columns)]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    columns = list(dict.fromkeys(c for f in frames for c in f.columns))
+    categorical = [
+        col for col in columns
+        if all(col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames)
+    ]
+    # Union categoricals separately so they are never expanded to object in between.
+    combined = pd.concat([f.drop(columns=categorical) for f in frames], ignore_index=True)
+    for col in categorical:
+        combined[col] = union_categoricals([f[col] for f in frames], sort_categories=True, ignore_order=True)
+    return combined[columns]
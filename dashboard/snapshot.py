@@ -0,0 +1,104 @@
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+VISITS_FILE = "visits.parquet"
+CPT_REF_FILE = "cpt_ref.parquet"
+META_FILE = "meta.json"
+
+
+class SnapshotCache:
+    """Columnar on-disk snapshots of the preprocessed dataset.
+
+    Each snapshot lives in its own directory named after the content hash of
+    the source workbook, so an unchanged source always maps to the same
+    snapshot and a changed one can never be served stale data.
+    """
+
+    def __init__(self, root, keep=3):
+        self.root = root
+        self.keep = keep
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def load(self, key):
+        """Return ``(visits, cpt_ref, meta)`` for ``key`` or ``None`` on a miss."""
+        path = self._path(key)
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            visits = pd.read_parquet(os.path.join(path, VISITS_FILE))
+            cpt_ref = pd.DataFrame()
+            if meta.get("has_cpt_ref"):
+                cpt_ref = pd.read_parquet(os.path.join(path, CPT_REF_FILE))
+        except Exception:
+            logger.exception(f"Discarding unreadable snapshot {key}")
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+        # Touch the directory so pruning keeps recently used snapshots.
+        os.utime(path)
+        return visits, cpt_ref, meta
+
+    def latest(self):
+        """Return the most recently used snapshot, whatever its key, or ``None``."""
+        for key in self._keys_by_recency():
+            hit = self.load(key)
+            if hit is not None:
+                return hit
+        return None
+
+    def save(self, key, visits, cpt_ref, build_seconds, **extra):
+        """Write a snapshot; failures are logged and never raised to the app.
+
+        ``extra`` is stored alongside the standard metadata.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, f".tmp-{uuid.uuid4().hex}")
+        try:
+            os.makedirs(tmp)
+            visits.to_parquet(os.path.join(tmp, VISITS_FILE), index=False)
+            has_cpt_ref = not cpt_ref.empty
+            if has_cpt_ref:
+                cpt_ref.to_parquet(os.path.join(tmp, CPT_REF_FILE), index=False)
+            meta = {
+                "key": key,
+                "rows": len(visits),
+                "build_seconds": build_seconds,
+                "has_cpt_ref": has_cpt_ref,
+                "created": time.time(),
+                **extra,
+            }
+            with open(os.path.join(tmp, META_FILE), "w") as f:
+                json.dump(meta, f)
+            path = self._path(key)
+            shutil.rmtree(path, ignore_errors=True)
+            os.replace(tmp, path)
+        except Exception:
+            logger.exception(f"Could not write snapshot {key}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            return False
+        self.prune()
+        return True
+
+    def _keys_by_recency(self):
+        try:
+            keys = [name for name in os.listdir(self.root) if not name.startswith(".")]
+        except FileNotFoundError:
+            return []
+        return sorted(keys, key=lambda key: os.path.getmtime(self._path(key)), reverse=True)
+
+    def prune(self):
+        """Drop all but the ``keep`` most recently used snapshots."""
+        for key in self._keys_by_recency()[self.keep:]:
+            shutil.rmtree(self._path(key), ignore_errors=True)
@@ -0,0 +1,90 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dashboard.instrumentation import stage
+
+
+class VisitView:
+    """A filtered view of the shared visit table: row positions, never a copy.
+
+    Every session references the same :class:`~dashboard.loader.Dataset`;
+    a view only stores which rows the current filters select. Columns are
+    materialized on request, and only for the selected rows.
+    """
+
+    def __init__(self, visits, rows):
+        self.visits = visits
+        self.rows = rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def nbytes(self):
+        """Memory this view holds of its own: the row positions."""
+        return int(np.asarray(self.rows).nbytes)
+
+    @property
+    def columns(self):
+        return self.visits.columns
+
+    def column(self, name):
+        """Values of one column for the selected rows."""
+        return self.visits[name].take(self.rows)
+
+    def frame(self, columns=None, rows=None):
+        """Materialize ``columns`` (default all) for the selected rows, or a subset of them.
+
+        ``rows`` indexes into this view's selection, e.g. ``slice(0, 50)``
+        for the first page.
+        """
+        positions = self.rows if rows is None else np.asarray(self.rows)[rows]
+        visits = self.visits if columns is None else self.visits[list(columns)]
+        return visits.take(positions).reset_index(drop=True)
+
+
+# Rank of missing values, so they sort last in either direction.
+MISSING_RANK = np.iinfo(np.int32).max
+
+
+class SortIndex:
+    """Global sort rank of every visit, per column, built on first use of each column.
+
+    Sorting a selection then only orders small integers for the selected
+    rows (``O(k log k)`` for ``k`` rows) instead of sorting a materialized
+    frame of them.
+    """
+
+    def __init__(self, df):
+        self._df = df
+        self._ranks = {}
+        self._lock = threading.Lock()
+
+    def ranks(self, column):
+        """``int32`` rank of each visit's ``column`` value; equal values share a rank."""
+        with self._lock:
+            if column not in self._ranks:
+                with stage("sort.rank", column=column):
+                    self._ranks[column] = _ranks(self._df[column])
+            return self._ranks[column]
+
+    def order(self, rows, column, ascending=True):
+        """``rows`` sorted by ``column``, ties kept in their original order."""
+        keys = self.ranks(column)[rows]
+        if not ascending:
+            keys = np.where(keys == MISSING_RANK, MISSING_RANK, -keys)
+        return rows[np.argsort(keys, kind="stable")]
+
+
+def _ranks(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        # Rank by label, not by the (unsorted, union-built) category order.
+        categories = values.cat.categories
+        label_rank = np.empty(len(categories), dtype=np.int32)
+        label_rank[categories.argsort()] = np.arange(len(categories), dtype=np.int32)
+        codes = values.cat.codes.to_numpy()
+        return np.where(codes >= 0, label_rank[codes], MISSING_RANK).astype(np.int32)
+    codes, _ = pd.factorize(values, sort=True)
+    return np.where(codes >= 0, codes, MISSING_RANK).astype(np.int32)
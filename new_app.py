@@ -1,183 +1,156 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from datetime import datetime, timedelta
-import gdown
-from io import BytesIO
+from datetime import date, timedelta
+
+from dashboard.charts import plotly_chart
+from dashboard.drilldown import drilldown_table, paged_table
+from dashboard.episodes import DEFAULT_PAIRING, PAIRING_LABELS, PAIRING_RULES
+from dashboard.export import export_controls
+from dashboard.filters import DATE_PRESETS, preset_range
+from dashboard.instrumentation import begin_rerun, stage
+from dashboard.manifest import SOURCES
+from dashboard.metrics import METRIC_CACHE, FilterState, compute
+from dashboard.refresher import shared_refresher
 
 # -------------------- CONFIG --------------------
 st.set_page_config(page_title="📊 APP Dashboard", layout="wide")
 st.title("📊 APP Client Dashboard")
+begin_rerun("new_app")
 
 # -------------------- DATA LOADER --------------------
-file_id = "1PlTbACUnIAOkTzM-m06j_lQvX62kiFKB"
-download_url = f"https://drive.google.com/uc?id={file_id}"
+download_url = tuple(SOURCES) if len(SOURCES) > 1 else SOURCES[0]
+
+@st.cache_resource
+def get_refresher(url):
+    return shared_refresher(url)
 
-@st.cache_data
 def load_excel_from_drive(url):
     try:
-        output = BytesIO()
-        gdown.download(url, output, quiet=True)
-        output.seek(0)
-        xls = pd.ExcelFile(output, engine='openpyxl')
-
-        # Main Data
-        df = pd.read_excel(xls, sheet_name=xls.sheet_names[0])
-
-        # CPT Reference (optional if exists)
-        cpt_ref = pd.DataFrame()
-        if "Sheet1" in xls.sheet_names:
-            cpt_ref = pd.read_excel(xls, sheet_name="Sheet1")
-            cpt_ref['CPT Code'] = cpt_ref['CPT Code'].astype(str).str.strip()
-            for col in ['Charge/Unit', 'Expected']:
-                if col in cpt_ref.columns:
-                    cpt_ref[col] = pd.to_numeric(
-                        cpt_ref[col].replace('[\$,]', '', regex=True),
-                        errors='coerce'
-                    )
-
-        # --- Preprocessing ---
-        df['Visit Date'] = pd.to_datetime(df['Visit Date'], errors='coerce')
-        df['Transaction Date'] = pd.to_datetime(df['Transaction Date'], errors='coerce')
-        df['Week'] = df['Visit Date'].dt.to_period('W').astype(str)
-        df['Month'] = df['Visit Date'].dt.to_period('M').astype(str)
-        df['Encounter Lag'] = (df['Transaction Date'] - df['Visit Date']).dt.days
-        df['CPT Code'] = df['CPT Code'].astype(str).str.strip()
-        df['CPT Category'] = df['CPT Code'].map(
-            lambda x: 'Initial' if x in ['99304','99305','99306'] 
-            else 'Follow-up' if x in ['99307','99308','99309','99310'] 
-            else 'Other'
-        )
-
-        if not cpt_ref.empty:
-            df = df.merge(cpt_ref, on="CPT Code", how="left")
-
-        return df
-
+        refresher = get_refresher(url)
+        with stage("data.load.hit" if refresher.loaded else "data.load.miss") as fields:
+            dataset = refresher.current()
+            fields["rows"] = len(dataset.visits)
+        return dataset
     except Exception as e:
         st.error(f"Error loading file: {e}")
         return None
 
 # -------------------- LOAD DATA --------------------
-df = load_excel_from_drive(download_url)
+dataset = load_excel_from_drive(download_url)
+refresher = get_refresher(download_url)
+df = dataset.visits if dataset is not None else None
 
 if df is not None:
     # -------------------- FILTERS --------------------
     st.sidebar.header("🔎 Filters")
-    today = datetime.today()
+    if dataset.from_snapshot:
+        st.sidebar.caption(f"⚡ Loaded from cache in {dataset.load_seconds:.1f}s (saved {dataset.saved_seconds:.1f}s)")
+    if refresher.last_refresh is not None:
+        st.sidebar.caption(f"🔄 Data refreshed {refresher.last_refresh:%Y-%m-%d %H:%M:%S} (took {refresher.last_duration:.1f}s)")
+    if refresher.last_error is not None:
+        st.sidebar.warning(f"⚠️ Last refresh failed: {refresher.last_error}")
+    for part in dataset.parts or []:
+        if part["error"]:
+            action = f"Serving last good copy of {part['source']}" if part.get("stale") else f"Skipped {part['source']}"
+            st.sidebar.warning(f"⚠️ {action}: {part['error']}")
+    today = date.today()
+    index = dataset.filter_index
+
+    dos_filter = st.sidebar.selectbox("Date of Service (Visit Date)", DATE_PRESETS)
+
+    date_range = preset_range(dos_filter, today)
+    if date_range is not None:
+        start_date, end_date = date_range
+    else:  # Custom
+        start_date = st.sidebar.date_input("Start Date", today - timedelta(days=30))
+        end_date = st.sidebar.date_input("End Date", today)
 
-    dos_filter = st.sidebar.selectbox(
-        "Date of Service (Visit Date)",
-        ["Last 30 Days", "Current Week", "Last 14 Days", "Current Month",
-         "Current Quarter", "Current Year", "Custom Range"]
+    # Additional filters
+    providers = st.sidebar.multiselect("Provider", index.options.get('Provider Name', []))
+    facilities = st.sidebar.multiselect("Facility", index.options.get('Facility Name', []))
+    states = st.sidebar.multiselect("State/Region", index.options.get('State', []))
+    payer_class = st.sidebar.multiselect("Payer Class", index.options.get('Payer Class', []))
+    encounter_type = st.sidebar.multiselect("Encounter Type", index.options.get('Encounter Type', []))
+
+    selections = {
+        'Provider Name': providers,
+        'Facility Name': facilities,
+        'State': states,
+        'Payer Class': payer_class,
+        'Encounter Type': encounter_type,
+    }
+    pairing = st.sidebar.selectbox(
+        "CCM Delay Measured From", PAIRING_RULES, index=PAIRING_RULES.index(DEFAULT_PAIRING),
+        format_func=PAIRING_LABELS.get,
     )
+    state = FilterState.create(start_date, end_date, selections)
 
-    if dos_filter == "Last 30 Days":
-        start_date, end_date = today - timedelta(days=30), today
-    elif dos_filter == "Current Week":
-        start_date, end_date = today - timedelta(days=today.weekday()), today
-    elif dos_filter == "Last 14 Days":
-        start_date, end_date = today - timedelta(days=14), today
-    elif dos_filter == "Current Month":
-        start_date, end_date = today.replace(day=1), today
-    elif dos_filter == "Current Quarter":
-        q = (today.month - 1) // 3 + 1
-        start_date, end_date = datetime(today.year, 3*(q-1)+1, 1), today
-    elif dos_filter == "Current Year":
-        start_date, end_date = datetime(today.year, 1, 1), today
-    else:  # Custom
-        start_date = pd.to_datetime(st.sidebar.date_input("Start Date", today - timedelta(days=30)))
-        end_date = pd.to_datetime(st.sidebar.date_input("End Date", today))
-
-    df = df.query("`Visit Date` >= @start_date and `Visit Date` <= @end_date")
+    stats = METRIC_CACHE.stats()
+    st.sidebar.caption(f"🧮 Metric cache: {stats['hits']} hits / {stats['misses']} misses, {stats['nbytes'] / 2**20:.1f} MB")
 
-    # Additional filters
-    providers = st.sidebar.multiselect("Provider", sorted(df['Provider Name'].dropna().unique()))
-    facilities = st.sidebar.multiselect("Facility", sorted(df['Facility Name'].dropna().unique()))
-    states = st.sidebar.multiselect("State/Region", sorted(df['State'].dropna().unique()) if "State" in df else [])
-    payer_class = st.sidebar.multiselect("Payer Class", sorted(df['Payer Class'].dropna().unique()) if "Payer Class" in df else [])
-    encounter_type = st.sidebar.multiselect("Encounter Type", sorted(df['Encounter Type'].dropna().unique()) if "Encounter Type" in df else [])
-
-    if providers: df = df[df['Provider Name'].isin(providers)]
-    if facilities: df = df[df['Facility Name'].isin(facilities)]
-    if states: df = df[df['State'].isin(states)]
-    if payer_class: df = df[df['Payer Class'].isin(payer_class)]
-    if encounter_type: df = df[df['Encounter Type'].isin(encounter_type)]
+    st.sidebar.header("📥 Export")
+    export_controls(dataset, state, pairing)
 
     # -------------------- DASHBOARD TABS --------------------
-    tab1, tab2, tab3, tab4 = st.tabs(["📈 Executive", "⚙️ Operations", "📊 Growth", "✅ Quality"])
+    # Only the selected tab is rendered, so only its metrics are computed.
+    tab = st.radio("Tab", ["📈 Executive", "⚙️ Operations", "📊 Growth", "✅ Quality"],
+                   horizontal=True, label_visibility="collapsed")
 
     # ---------------- EXECUTIVE ----------------
-    with tab1:
+    if tab == "📈 Executive":
         st.markdown("### 🗓️ Provider Weekly Visit Count")
-        weekly = df.groupby(['Provider Name', 'Week'])['Visit ID'].count().reset_index()
-        st.plotly_chart(px.bar(weekly, x='Week', y='Visit ID', color='Provider Name', barmode='group'),
-                        use_container_width=True)
+        plotly_chart('provider_weekly_visits', dataset, state)
 
         st.markdown("### 🎯 % to Target (Provider)")
-        weekly['% to Target'] = (weekly['Visit ID'] / 120) * 100
-        fig2 = px.bar(weekly, x='Week', y='% to Target', color='Provider Name', barmode='group')
-        fig2.update_yaxes(range=[0, 150])
-        st.plotly_chart(fig2, use_container_width=True)
+        plotly_chart('provider_weekly_target', dataset, state)
+
+        with st.expander("🔍 Drill down to visits"):
+            drilldown_table(dataset, state, key="executive", column='Provider Name')
 
     # ---------------- OPERATIONS ----------------
-    with tab2:
+    elif tab == "⚙️ Operations":
         st.markdown("### 🏥 Visit Count by Facility (Monthly)")
-        monthly_facility = df.groupby(['Facility Name', 'Month'])['Visit ID'].count().reset_index()
-        st.plotly_chart(px.bar(monthly_facility, x='Month', y='Visit ID', color='Facility Name', barmode='stack'),
-                        use_container_width=True)
+        plotly_chart('facility_monthly_visits', dataset, state)
 
         st.markdown("### 📊 % to Target (Facility)")
-        monthly_facility['% to Target'] = (monthly_facility['Visit ID'] / 120) * 100
-        fig4 = px.line(monthly_facility, x='Month', y='% to Target', color='Facility Name', markers=True)
-        fig4.update_yaxes(range=[0, 150])
-        st.plotly_chart(fig4, use_container_width=True)
+        plotly_chart('facility_monthly_target', dataset, state)
 
         st.markdown("### 🚀 New Facility Ramp Tracker")
-        ramp = df.groupby(['Facility Name', 'Week'])['Visit ID'].count().reset_index()
-        ramp['% Ramp'] = (ramp['Visit ID'] / 120) * 100
-        st.plotly_chart(px.area(ramp, x='Week', y='% Ramp', color='Facility Name'),
-                        use_container_width=True)
+        plotly_chart('facility_ramp', dataset, state)
 
         st.markdown("### 📅 Working Days by Provider")
-        working_days = df.groupby(['Provider Name', 'Month'])['Visit Date'].nunique().reset_index()
-        working_days.rename(columns={'Visit Date': 'Working Days'}, inplace=True)
-        st.plotly_chart(px.bar(working_days, x='Month', y='Working Days', color='Provider Name', barmode='group'),
-                        use_container_width=True)
+        plotly_chart('provider_working_days', dataset, state)
+
+        with st.expander("🔍 Drill down to visits"):
+            drilldown_table(dataset, state, key="operations", column='Facility Name')
 
     # ---------------- GROWTH ----------------
-    with tab3:
+    elif tab == "📊 Growth":
         st.markdown("### ⏱️ CCM Start Delay by Facility")
-        em_codes = ['99304','99305','99306','99307','99308','99309','99310']
-        df_em = df[df['CPT Code'].isin(em_codes)]
-        df_99487 = df[df['CPT Code'] == '99487']
-
-        if not df_em.empty and not df_99487.empty:
-            delay_df = pd.merge(df_em, df_99487, on='Patient ID', suffixes=('_EM', '_99487'))
-            delay_df['CCM Delay'] = (delay_df['Visit Date_99487'] - delay_df['Visit Date_EM']).dt.days
-            delay_summary = delay_df.groupby('Facility Name_EM')['CCM Delay'].mean().reset_index()
-            st.dataframe(delay_summary.style.background_gradient(cmap='Oranges'))
+        delay_summary = compute('growth.ccm_delay_by_facility', dataset, state, pairing=pairing)
+
+        if not delay_summary.empty:
+            with stage("render.ccm_delay_by_facility"):
+                paged_table(delay_summary, key="ccm_delay", cmap='Oranges')
         else:
             st.warning("⚠️ No CCM delay data found.")
 
+        with st.expander("🔍 Drill down to visits"):
+            drilldown_table(dataset, state, key="growth", column='Facility Name')
+
     # ---------------- QUALITY ----------------
-    with tab4:
+    else:
         st.markdown("### 🕒 Provider Encounter Lag")
-        lag_df = df.groupby(['Provider Name', 'Week'])['Encounter Lag'].mean().reset_index()
-        st.plotly_chart(px.line(lag_df, x='Week', y='Encounter Lag', color='Provider Name', markers=True),
-                        use_container_width=True)
+        plotly_chart('provider_lag', dataset, state)
 
         st.markdown("### 🧬 Provider CPT Mix – Initial vs Follow-Up")
-        cpt_init = df[df['CPT Category'] == 'Initial'].groupby('Provider Name')['Visit ID'].count().reset_index()
-        cpt_follow = df[df['CPT Category'] == 'Follow-up'].groupby('Provider Name')['Visit ID'].count().reset_index()
-
         col1, col2 = st.columns(2)
         with col1:
-            st.plotly_chart(px.pie(cpt_init, names='Provider Name', values='Visit ID',
-                                   title='Initial Visits (99304–99306)'), use_container_width=True)
+            plotly_chart('cpt_initial', dataset, state)
         with col2:
-            st.plotly_chart(px.pie(cpt_follow, names='Provider Name', values='Visit ID',
-                                   title='Follow-up Visits (99307–99310)'), use_container_width=True)
+            plotly_chart('cpt_follow_up', dataset, state)
+
+        with st.expander("🔍 Drill down to visits"):
+            drilldown_table(dataset, state, key="quality", column='Provider Name')
 
 else:
     st.warning("⚠️ Unable to load data from Google Drive Excel file.")
@@ -1,9 +1,17 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-from datetime import datetime, timedelta
-import gdown
-from io import BytesIO
+from datetime import date, timedelta
+
+from dashboard.charts import plotly_chart
+from dashboard.diagnostics import MEMORY_HISTORY
+from dashboard.drilldown import drilldown_table, paged_table
+from dashboard.episodes import DEFAULT_PAIRING, PAIRING_LABELS, PAIRING_RULES
+from dashboard.export import export_controls
+from dashboard.filters import DATE_PRESETS, FILTER_COLUMNS, preset_range
+from dashboard.instrumentation import STAGES, begin_rerun, stage
+from dashboard.manifest import SOURCES
+from dashboard.metrics import METRIC_CACHE, FilterState, compute
+from dashboard.refresher import shared_refresher
+from dashboard.schema import memory_report
 
 # ---------------- CONFIG ----------------
 st.set_page_config(page_title="APP Dashboard", layout="wide")
@@ -29,69 +37,20 @@ if not st.session_state["authenticated"]:
     login_page()
     st.stop()
 
+begin_rerun("protected_app")
+
 # ---------------- DATA LOADER ----------------
-file_id = "1PlTbACUnIAOkTzM-m06j_lQvX62kiFKB"
-download_url = f"https://drive.google.com/uc?id={file_id}&export=download"
-
-@st.cache_data
-def load_excel_from_drive(url):
-    output = BytesIO()
-    gdown.download(url, output, quiet=True)
-    output.seek(0)
-    xls = pd.ExcelFile(output, engine="openpyxl")
-
-    df = pd.read_excel(xls, sheet_name=xls.sheet_names[0])
-
-    # Load optional CPT reference
-    cpt_ref = pd.DataFrame()
-    if "Sheet1" in xls.sheet_names:
-        cpt_ref = pd.read_excel(xls, sheet_name="Sheet1")
-        if "CPT Code" in cpt_ref.columns:
-            cpt_ref["CPT Code"] = cpt_ref["CPT Code"].astype(str).str.strip()
-        for col in ["Charge/Unit", "Expected"]:
-            if col in cpt_ref.columns:
-                cpt_ref[col] = pd.to_numeric(cpt_ref[col].replace(r"[\$,]", "", regex=True), errors="coerce")
-
-    # Date parsing
-    for col in ["Visit Date", "Transaction Date"]:
-        if col in df.columns:
-            df[col] = pd.to_datetime(df[col], errors="coerce")
-
-    # Derived time fields
-    if "Visit Date" in df.columns:
-        df["Week"] = df["Visit Date"].dt.to_period("W").astype(str)
-        df["Month"] = df["Visit Date"].dt.to_period("M").astype(str)
-    else:
-        df["Week"] = pd.NA
-        df["Month"] = pd.NA
-
-    if {"Visit Date", "Transaction Date"}.issubset(df.columns):
-        df["Encounter Lag"] = (df["Transaction Date"] - df["Visit Date"]).dt.days
-    else:
-        df["Encounter Lag"] = pd.NA
-
-    # CPT Classification
-    if "CPT Code" in df.columns:
-        df["CPT Code"] = df["CPT Code"].astype(str).str.strip()
-        em_init = {"99304", "99305", "99306"}
-        em_follow = {"99307", "99308", "99309", "99310"}
-        df["CPT Category"] = df["CPT Code"].apply(
-            lambda x: "Initial" if x in em_init else "Follow-up" if x in em_follow else "Other"
-        )
-    else:
-        df["CPT Code"] = pd.NA
-        df["CPT Category"] = pd.NA
-
-    # Merge reference if available
-    if not cpt_ref.empty and "CPT Code" in cpt_ref.columns:
-        df = df.merge(cpt_ref, on="CPT Code", how="left")
-
-    if "Visit ID" not in df.columns:
-        df.insert(0, "Visit ID", range(1, len(df) + 1))
-
-    return df
-
-df = load_excel_from_drive(download_url)
+download_url = tuple(SOURCES) if len(SOURCES) > 1 else SOURCES[0]
+
+@st.cache_resource
+def get_refresher(url):
+    return shared_refresher(url)
+
+refresher = get_refresher(download_url)
+with stage("data.load.hit" if refresher.loaded else "data.load.miss") as fields:
+    dataset = refresher.current()
+    fields["rows"] = len(dataset.visits)
+df = dataset.visits
 
 if df is None or df.empty:
     st.error("Failed to load dataset.")
@@ -99,111 +58,117 @@ if df is None or df.empty:
 
 # ---------------- FILTERS ----------------
 st.sidebar.header("Filters")
-today = datetime.today()
-
-date_option = st.sidebar.selectbox(
-    "Date of Service",
-    ["Last 30 Days", "Current Week", "Last 14 Days", "Current Month", "Current Quarter", "Current Year", "Custom Range"],
-)
-
-if date_option == "Last 30 Days":
-    start_date, end_date = today - timedelta(days=30), today
-elif date_option == "Current Week":
-    start_date, end_date = today - timedelta(days=today.weekday()), today
-elif date_option == "Last 14 Days":
-    start_date, end_date = today - timedelta(days=14), today
-elif date_option == "Current Month":
-    start_date, end_date = today.replace(day=1), today
-elif date_option == "Current Quarter":
-    q = (today.month - 1) // 3 + 1
-    start_date, end_date = datetime(today.year, 3 * (q - 1) + 1, 1), today
-elif date_option == "Current Year":
-    start_date, end_date = datetime(today.year, 1, 1), today
+if dataset.from_snapshot:
+    st.sidebar.caption(f"Loaded from cache in {dataset.load_seconds:.1f}s (saved {dataset.saved_seconds:.1f}s)")
+if refresher.last_refresh is not None:
+    st.sidebar.caption(f"Data refreshed {refresher.last_refresh:%Y-%m-%d %H:%M:%S} (took {refresher.last_duration:.1f}s)")
+if refresher.last_error is not None:
+    st.sidebar.warning(f"Last refresh failed: {refresher.last_error}")
+for part in dataset.parts or []:
+    if part["error"]:
+        action = f"Serving last good copy of {part['source']}" if part.get("stale") else f"Skipped {part['source']}"
+        st.sidebar.warning(f"{action}: {part['error']}")
+today = date.today()
+index = dataset.filter_index
+
+date_option = st.sidebar.selectbox("Date of Service", DATE_PRESETS)
+
+date_range = preset_range(date_option, today)
+if date_range is not None:
+    start_date, end_date = date_range
 else:
-    start_date = pd.to_datetime(st.sidebar.date_input("Start Date", today - timedelta(days=30)))
-    end_date = pd.to_datetime(st.sidebar.date_input("End Date", today))
-
-if "Visit Date" in df.columns:
-    df = df[(df["Visit Date"] >= start_date) & (df["Visit Date"] <= end_date)]
+    start_date = st.sidebar.date_input("Start Date", today - timedelta(days=30))
+    end_date = st.sidebar.date_input("End Date", today)
 
 filters = {
-    "Provider Name": st.sidebar.multiselect("Provider", sorted(df.get("Provider Name", pd.Series()).dropna().unique())),
-    "Facility Name": st.sidebar.multiselect("Facility", sorted(df.get("Facility Name", pd.Series()).dropna().unique())),
-    "State": st.sidebar.multiselect("State/Region", sorted(df.get("State", pd.Series()).dropna().unique())),
-    "Payer Class": st.sidebar.multiselect("Payer Class", sorted(df.get("Payer Class", pd.Series()).dropna().unique())),
-    "Encounter Type": st.sidebar.multiselect("Encounter Type", sorted(df.get("Encounter Type", pd.Series()).dropna().unique())),
+    col: st.sidebar.multiselect(label, index.options.get(col, []))
+    for col, label in FILTER_COLUMNS.items()
 }
 
-for col, selected in filters.items():
-    if selected and col in df.columns:
-        df = df[df[col].isin(selected)]
+pairing = st.sidebar.selectbox(
+    "CCM Delay Measured From", PAIRING_RULES, index=PAIRING_RULES.index(DEFAULT_PAIRING),
+    format_func=PAIRING_LABELS.get,
+)
+state = FilterState.create(start_date, end_date, filters)
+
+stats = METRIC_CACHE.stats()
+st.sidebar.caption(f"Metric cache: {stats['hits']} hits / {stats['misses']} misses, {stats['nbytes'] / 2**20:.1f} MB")
+
+# ---------------- EXPORT ----------------
+st.sidebar.header("Export")
+export_controls(dataset, state, pairing)
+
+# ---------------- DIAGNOSTICS ----------------
+MEMORY_HISTORY.record()
+with st.sidebar.expander("Diagnostics"):
+    history = MEMORY_HISTORY.frame()
+    latest = history.iloc[-1]
+    st.caption(f"Process RSS: {latest['RSS (MB)']:.0f} MB across {latest['Active Sessions'] or 0} active sessions")
+    st.caption(f"Shared dataset: {dataset.nbytes / 2**20:.1f} MB, {len(df):,} rows")
+    st.line_chart(history[["RSS (MB)"]])
+    st.line_chart(history[["Active Sessions"]])
+    if dataset.memory_rows:
+        st.dataframe(memory_report(dataset.memory_rows), hide_index=True)
+    st.caption("Stage timings (recent reruns, all sessions)")
+    st.dataframe(STAGES.summary(), hide_index=True)
 
 # ---------------- DASHBOARD ----------------
-tab1, tab2, tab3, tab4 = st.tabs(["Executive", "Operations", "Growth", "Quality"])
+# Only the selected tab is rendered, so only its metrics are computed.
+tab = st.radio("Tab", ["Executive", "Operations", "Growth", "Quality"], horizontal=True, label_visibility="collapsed")
 
 # EXECUTIVE TAB
-with tab1:
+if tab == "Executive":
     st.subheader("Provider Weekly Visit Count")
     if {"Provider Name", "Week"}.issubset(df.columns):
-        weekly = df.groupby(["Provider Name", "Week"])["Visit ID"].count().reset_index(name="Visit Count")
-        fig = px.bar(weekly, x="Week", y="Visit Count", color="Provider Name", barmode="group")
-        st.plotly_chart(fig, use_container_width=True)
+        plotly_chart("provider_weekly_visits", dataset, state)
 
         st.subheader("% to Target (Provider)")
-        weekly["% to Target"] = (weekly["Visit Count"] / 120) * 100
-        fig2 = px.bar(weekly, x="Week", y="% to Target", color="Provider Name", barmode="group")
-        fig2.update_yaxes(range=[0, 150])
-        st.plotly_chart(fig2, use_container_width=True)
+        plotly_chart("provider_weekly_target", dataset, state)
+
+    with st.expander("Drill down to visits"):
+        drilldown_table(dataset, state, key="executive", column="Provider Name")
 
 # OPERATIONS TAB
-with tab2:
+elif tab == "Operations":
     st.subheader("Visit Count by Facility (Monthly)")
     if {"Facility Name", "Month"}.issubset(df.columns):
-        monthly = df.groupby(["Facility Name", "Month"])["Visit ID"].count().reset_index(name="Visit Count")
-        fig3 = px.bar(monthly, x="Month", y="Visit Count", color="Facility Name", barmode="stack")
-        st.plotly_chart(fig3, use_container_width=True)
-
-        monthly["% to Target"] = (monthly["Visit Count"] / 120) * 100
-        fig4 = px.line(monthly, x="Month", y="% to Target", color="Facility Name", markers=True)
-        fig4.update_yaxes(range=[0, 150])
-        st.plotly_chart(fig4, use_container_width=True)
+        plotly_chart("facility_monthly_visits", dataset, state)
+        plotly_chart("facility_monthly_target", dataset, state)
 
     st.subheader("Working Days by Provider")
     if {"Provider Name", "Month", "Visit Date"}.issubset(df.columns):
-        work = df.groupby(["Provider Name", "Month"])["Visit Date"].nunique().reset_index(name="Working Days")
-        st.plotly_chart(px.bar(work, x="Month", y="Working Days", color="Provider Name", barmode="group"), use_container_width=True)
+        plotly_chart("provider_working_days", dataset, state)
+
+    with st.expander("Drill down to visits"):
+        drilldown_table(dataset, state, key="operations", column="Facility Name")
 
 # GROWTH TAB
-with tab3:
+elif tab == "Growth":
     st.subheader("CCM Start Delay by Facility")
-    em_codes = {"99304", "99305", "99306", "99307", "99308", "99309", "99310"}
     if {"CPT Code", "Patient ID", "Visit Date"}.issubset(df.columns):
-        df_em = df[df["CPT Code"].isin(em_codes)]
-        df_ccm = df[df["CPT Code"] == "99487"]
-        if not df_em.empty and not df_ccm.empty:
-            em_first = df_em.sort_values("Visit Date").groupby("Patient ID").first().reset_index()
-            ccm_first = df_ccm.sort_values("Visit Date").groupby("Patient ID").first().reset_index()
-            delay = pd.merge(em_first, ccm_first, on="Patient ID", suffixes=("_EM", "_CCM"))
-            delay["CCM Delay (days)"] = (delay["Visit Date_CCM"] - delay["Visit Date_EM"]).dt.days
-            delay_summary = delay.groupby("Facility Name_EM")["CCM Delay (days)"].mean().reset_index()
-            st.dataframe(delay_summary.style.background_gradient(cmap="RdYlGn_r"))
+        delay_summary = compute("growth.ccm_delay_by_facility", dataset, state, pairing=pairing)
+        if not delay_summary.empty:
+            with stage("render.ccm_delay_by_facility"):
+                paged_table(delay_summary, key="ccm_delay", cmap="RdYlGn_r")
         else:
             st.info("No CCM data found.")
 
+    with st.expander("Drill down to visits"):
+        drilldown_table(dataset, state, key="growth", column="Facility Name")
+
 # QUALITY TAB
-with tab4:
+else:
     st.subheader("Provider Encounter Lag")
     if {"Provider Name", "Week", "Encounter Lag"}.issubset(df.columns):
-        lag = df.groupby(["Provider Name", "Week"])["Encounter Lag"].mean().reset_index()
-        st.plotly_chart(px.line(lag, x="Week", y="Encounter Lag", color="Provider Name", markers=True), use_container_width=True)
+        plotly_chart("provider_lag", dataset, state)
 
     st.subheader("Provider CPT Mix – Initial vs Follow-Up")
     if {"Provider Name", "CPT Category"}.issubset(df.columns):
-        init = df[df["CPT Category"] == "Initial"].groupby("Provider Name")["Visit ID"].count().reset_index(name="Count")
-        follow = df[df["CPT Category"] == "Follow-up"].groupby("Provider Name")["Visit ID"].count().reset_index(name="Count")
-
         c1, c2 = st.columns(2)
         with c1:
-            st.plotly_chart(px.pie(init, names="Provider Name", values="Count", title="Initial Visits"), use_container_width=True)
+            plotly_chart("cpt_initial", dataset, state)
         with c2:
-            st.plotly_chart(px.pie(follow, names="Provider Name", values="Count", title="Follow-Up Visits"), use_container_width=True)
+            plotly_chart("cpt_follow_up", dataset, state)
+
+    with st.expander("Drill down to visits"):
+        drilldown_table(dataset, state, key="quality", column="Provider Name")
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+CPT_CODES = ["99304", "99305", "99306", "99307", "99308", "99309", "99310", "99487", "99490"]
+
+
+def raw_visits(rows=2_000, seed=0, first_id=1):
+    """A parsed-workbook-like frame of ``rows`` visits, with a few missing dates and codes."""
+    rng = np.random.default_rng(seed)
+    visit_date = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 400, rows), unit="D")
+    transaction_date = visit_date + pd.to_timedelta(rng.integers(0, 20, rows), unit="D")
+    df = pd.DataFrame({
+        "Visit ID": np.arange(first_id, first_id + rows),
+        "Patient ID": rng.integers(1_000, 1_000 + rows // 8, rows),
+        "Visit Date": visit_date,
+        "Transaction Date": transaction_date,
+        "CPT Code": rng.choice(CPT_CODES, rows),
+        "Provider Name": rng.choice([f"Provider {i:02d}" for i in range(15)], rows),
+        "Facility Name": rng.choice([f"Facility {i:02d}" for i in range(25)], rows),
+        "State": rng.choice(["TX", "CA", "NY"], rows),
+        "Payer Class": rng.choice(["Medicare", "Medicaid", "Commercial"], rows),
+        "Encounter Type": rng.choice(["Office", "Nursing Facility", "Telehealth"], rows),
+    })
+    missing = rng.random(rows)
+    df.loc[missing < 0.02, "Visit Date"] = pd.NaT
+    df.loc[(missing >= 0.02) & (missing < 0.03), "Transaction Date"] = pd.NaT
+    df.loc[(missing >= 0.03) & (missing < 0.04), "CPT Code"] = None
+    return df
+
+
+@pytest.fixture
+def make_raw():
+    return raw_visits
+
+
+@pytest.fixture
+def raw():
+    return raw_visits()
+
+
+@pytest.fixture
+def dataset(raw):
+    from dashboard.loader import Dataset, add_row_keys, preprocess
+
+    visits = preprocess(add_row_keys(raw), pd.DataFrame())
+    return Dataset(visits=visits, cpt_ref=pd.DataFrame(), version="test", load_seconds=0.0, build_seconds=0.0)
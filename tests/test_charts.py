@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from dashboard.charts import OTHER, compact, top_n
+from dashboard.metrics import FilterState, MetricCache, compute
+
+
+@pytest.fixture
+def weekly(dataset):
+    state = FilterState.create("2023-01-01", "2026-12-31", {})
+    return compute("executive.provider_weekly", dataset, state, cache=MetricCache())
+
+
+def rollup(df, x, series, value, keep, agg="sum"):
+    """The straightforward version: relabel minor series as "Other", then group."""
+    names = df[series].astype(object).where(df[series].isin(keep), OTHER)
+    return df.assign(**{series: names}).groupby([x, series], as_index=False)[value].agg(agg)
+
+
+def assert_same_rows(actual, expected, keys):
+    actual = actual.astype({key: str for key in keys}).sort_values(keys, ignore_index=True)
+    expected = expected.astype({key: str for key in keys}).sort_values(keys, ignore_index=True)
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False)
+
+
+def test_top_n_folds_the_smallest_series_into_other(weekly):
+    totals = weekly.groupby("Provider Name", observed=True)["Visit Count"].sum()
+    keep = totals.nlargest(4).index
+
+    folded = top_n(weekly, "Provider Name", "Visit Count", keys=["Week"], n=5)
+
+    assert_same_rows(folded, rollup(weekly, "Week", "Provider Name", "Visit Count", keep), ["Week", "Provider Name"])
+    assert folded["Visit Count"].sum() == weekly["Visit Count"].sum()
+
+
+def test_top_n_leaves_few_series_alone(weekly):
+    assert top_n(weekly, "Provider Name", "Visit Count", keys=["Week"], n=100) is weekly
+
+
+def test_compact_coarsens_weeks_to_months(weekly):
+    totals = weekly.groupby("Provider Name", observed=True)["Visit Count"].sum()
+    keep = totals.nlargest(4).index
+    by_month = weekly.assign(Week=weekly["Week"].str[:7])
+
+    compacted = compact(weekly, "Week", "Provider Name", "Visit Count", max_series=5, max_points=100)
+
+    expected = rollup(by_month, "Week", "Provider Name", "Visit Count", keep)
+    assert len(compacted) <= 100
+    assert_same_rows(compacted, expected, ["Week", "Provider Name"])
+    assert compacted["Provider Name"].iloc[-1] == OTHER
+
+
+def test_compact_ignores_filtered_out_categories(dataset):
+    state = FilterState.create("2023-01-01", "2026-12-31", {"Provider Name": ["Provider 01", "Provider 02"]})
+    weekly = compute("executive.provider_weekly", dataset, state, cache=MetricCache())
+
+    compacted = compact(weekly, "Week", "Provider Name", "Visit Count", max_series=5, max_points=40)
+
+    assert len(compacted) <= 40
+    assert set(compacted["Provider Name"]) == {"Provider 01", "Provider 02"}
+    assert compacted["Visit Count"].sum() == weekly["Visit Count"].sum()
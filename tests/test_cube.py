@@ -0,0 +1,58 @@
+import pandas as pd
+import pytest
+
+from dashboard.cube import VisitCube
+from dashboard.filters import FilterIndex
+
+SELECTIONS = [
+    ("2023-01-01", "2026-12-31", {}),
+    ("2024-02-01", "2024-07-15", {"Payer Class": ["Medicare"], "State": ["TX", "NY"]}),
+]
+
+
+@pytest.fixture(params=["cube", "rows"])
+def cube(request, dataset):
+    # A ratio no data can reach forces the row fallback.
+    min_ratio = 0.0 if request.param == "cube" else float("inf")
+    cube = VisitCube(dataset.visits, filter_index=FilterIndex(dataset.visits), min_ratio=min_ratio)
+    assert cube.materialized == (request.param == "cube")
+    return cube
+
+
+def selected(df, start, end, selections):
+    end = pd.Timestamp(end) + pd.Timedelta(days=1)
+    mask = (df["Visit Date"] >= pd.Timestamp(start)) & (df["Visit Date"] < end)
+    for col, values in selections.items():
+        mask &= df[col].isin(values)
+    return df[mask]
+
+
+def assert_same(actual, expected):
+    pd.testing.assert_frame_equal(
+        actual.reset_index(drop=True), expected.reset_index(drop=True), check_dtype=False, check_categorical=False
+    )
+
+
+@pytest.mark.parametrize("start, end, selections", SELECTIONS)
+def test_rollups_match_groupby_on_raw_rows(dataset, cube, start, end, selections):
+    df = selected(dataset.visits, start, end, selections)
+    part = cube.select(start, end, selections)
+
+    by = ["Provider Name", "Week"]
+    assert_same(part.count(by), df.groupby(by, observed=True)["Visit ID"].count().reset_index())
+    assert_same(part.mean_lag(by), df.groupby(by, observed=True)["Encounter Lag"].mean().reset_index())
+
+    by = ["Facility Name", "Month"]
+    working_days = df.groupby(by, observed=True)["Visit Date"].nunique().reset_index(name="Working Days")
+    assert_same(part.working_days(by), working_days)
+
+    initial = df[df["CPT Category"] == "Initial"]
+    expected = initial.groupby("Provider Name", observed=True)["Visit ID"].count().reset_index()
+    assert_same(part.where("CPT Category", "Initial").count(["Provider Name"]), expected)
+
+
+def test_ratio_is_measured(dataset):
+    cube = VisitCube(dataset.visits)
+    visits = dataset.visits["Visit Date"].notna().sum()
+    assert cube.materialized
+    assert cube.ratio == pytest.approx(visits / len(cube))
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from dashboard.episodes import PatientEpisodes, delay_by_facility
+from dashboard.filters import FilterIndex
+from dashboard.schema import CCM_CODE, EM_CODES
+
+
+def first_pairing(df):
+    """The original per-patient sort/groupby/merge: first E/M visit to first CCM visit."""
+    df_em = df[df["CPT Code"].isin(EM_CODES)]
+    df_ccm = df[df["CPT Code"] == CCM_CODE]
+    em_first = df_em.sort_values("Visit Date", kind="stable").groupby("Patient ID").first().reset_index()
+    ccm_first = df_ccm.sort_values("Visit Date", kind="stable").groupby("Patient ID").first().reset_index()
+    delay = pd.merge(em_first, ccm_first, on="Patient ID", suffixes=("_EM", "_CCM"))
+    delay["CCM Delay (days)"] = (delay["Visit Date_CCM"] - delay["Visit Date_EM"]).dt.days
+    return delay.dropna(subset=["CCM Delay (days)"])
+
+
+def nearest_preceding_pairing(df):
+    """Latest E/M visit on or before each patient's first CCM visit, by a pairwise merge."""
+    em = df[df["CPT Code"].isin(EM_CODES)].dropna(subset=["Visit Date"])
+    ccm = df[df["CPT Code"] == CCM_CODE].dropna(subset=["Visit Date"])
+    ccm_first = ccm.sort_values("Visit Date", kind="stable").groupby("Patient ID").head(1)
+    pairs = em.merge(ccm_first[["Patient ID", "Visit Date"]], on="Patient ID", suffixes=("_EM", "_CCM"))
+    pairs = pairs[pairs["Visit Date_EM"] <= pairs["Visit Date_CCM"]]
+    delay = pairs.sort_values("Visit Date_EM", kind="stable").groupby("Patient ID").tail(1)
+    delay = delay.rename(columns={"Facility Name": "Facility Name_EM"})
+    delay["CCM Delay (days)"] = (delay["Visit Date_CCM"] - delay["Visit Date_EM"]).dt.days
+    return delay
+
+
+REFERENCES = {"first": first_pairing, "nearest_preceding": nearest_preceding_pairing}
+
+
+def assert_same_delays(delays, expected):
+    delays = delays.sort_values("Patient ID", ignore_index=True)
+    expected = expected.sort_values("Patient ID", ignore_index=True)
+    assert delays["Patient ID"].tolist() == expected["Patient ID"].tolist()
+    assert delays["Facility Name"].astype(str).tolist() == expected["Facility Name_EM"].astype(str).tolist()
+    assert delays["CCM Delay (days)"].tolist() == expected["CCM Delay (days)"].tolist()
+
+
+@pytest.mark.parametrize("rule", sorted(REFERENCES))
+@pytest.mark.parametrize("start, end", [("2023-01-01", "2026-12-31"), ("2024-03-01", "2024-09-30")])
+def test_delays_match_pandas_reference(dataset, rule, start, end):
+    rows = FilterIndex(dataset.visits).select(start, end, {})
+    delays = PatientEpisodes(dataset.visits).delays(rows, rule)
+    expected = REFERENCES[rule](dataset.visits.take(rows))
+
+    assert len(delays) > 0
+    assert_same_delays(delays, expected)
+
+
+def test_delay_by_facility_matches_groupby_mean(dataset):
+    summary = delay_by_facility(PatientEpisodes(dataset.visits).delays())
+    expected = first_pairing(dataset.visits).groupby("Facility Name_EM", observed=True)["CCM Delay (days)"].mean()
+    assert summary["Facility Name"].astype(str).tolist() == expected.index.astype(str).tolist()
+    assert summary["CCM Delay (days)"].tolist() == pytest.approx(expected.tolist())
+
+
+def test_unknown_rule_is_rejected(dataset):
+    with pytest.raises(ValueError):
+        PatientEpisodes(dataset.visits).delays(rule="last")
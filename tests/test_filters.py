@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.filters import FilterIndex
+from dashboard.loader import add_row_keys, preprocess
+from dashboard.schema import concat_frames
+
+CASES = [
+    ("2023-01-01", "2026-12-31", {}),
+    ("2024-03-01", "2024-03-31", {}),
+    ("2024-05-05", "2024-05-05", {"State": ["TX"], "Encounter Type": []}),
+    ("2024-02-10", "2024-06-30", {"Provider Name": ["Provider 01", "Provider 07"]}),
+    ("2024-01-01", "2024-12-31", {"Facility Name": ["Facility 03"], "Payer Class": ["Medicare", "Commercial"]}),
+    ("2024-01-01", "2024-12-31", {"Provider Name": ["Nobody"]}),
+    ("2030-01-01", "2030-12-31", {}),
+]
+
+
+def expected_rows(df, start, end, selections):
+    """The rows a plain boolean mask over the frame selects."""
+    end = pd.Timestamp(end) + pd.Timedelta(days=1)
+    mask = (df["Visit Date"] >= pd.Timestamp(start)) & (df["Visit Date"] < end)
+    for col, values in selections.items():
+        if values:
+            mask &= df[col].isin(values)
+    return np.flatnonzero(mask.to_numpy())
+
+
+@pytest.mark.parametrize("start, end, selections", CASES)
+def test_select_matches_boolean_mask(dataset, start, end, selections):
+    index = FilterIndex(dataset.visits)
+    rows = index.select(start, end, selections)
+    np.testing.assert_array_equal(rows, expected_rows(dataset.visits, start, end, selections))
+
+
+def test_options_are_sorted_distinct_values(dataset):
+    index = FilterIndex(dataset.visits)
+    for col, values in index.options.items():
+        assert values == sorted(dataset.visits[col].dropna().unique())
+
+
+def test_options_stay_sorted_across_combined_parts(make_raw):
+    late = make_raw(300, seed=1)
+    late = late[late["Provider Name"] >= "Provider 08"]
+    parts = [preprocess(add_row_keys(raw), pd.DataFrame()) for raw in (late, make_raw(300, seed=2, first_id=5_000))]
+    index = FilterIndex(concat_frames(parts))
+    for values in index.options.values():
+        assert values == sorted(values)
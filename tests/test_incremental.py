@@ -0,0 +1,44 @@
+import pandas as pd
+
+from dashboard.loader import add_row_keys, preprocess, upsert
+
+
+def rebuild(raw):
+    return preprocess(add_row_keys(raw.copy()), pd.DataFrame())
+
+
+def assert_same_rows(actual, expected):
+    actual = actual.sort_values("Visit ID", ignore_index=True)
+    expected = expected[actual.columns].sort_values("Visit ID", ignore_index=True)
+    pd.testing.assert_frame_equal(actual, expected, check_dtype=False, check_categorical=False)
+
+
+def test_upsert_matches_full_rebuild(make_raw):
+    old = make_raw(2_000)
+    new = pd.concat([old.iloc[100:], make_raw(300, seed=1, first_id=10_000)], ignore_index=True)
+    new.loc[5:40, "Transaction Date"] += pd.Timedelta(days=1)
+    corrected = int(new.loc[5:40, "Transaction Date"].notna().sum())
+
+    visits, delta_rows = upsert(rebuild(old), add_row_keys(new.copy()), pd.DataFrame())
+
+    assert delta_rows == 300 + corrected
+    assert_same_rows(visits, rebuild(new))
+
+
+def test_upsert_of_unchanged_rows_is_a_no_op(raw):
+    previous = rebuild(raw)
+    visits, delta_rows = upsert(previous, add_row_keys(raw.copy()), pd.DataFrame())
+    assert delta_rows == 0
+    assert_same_rows(visits, previous)
+
+
+def test_row_keys_follow_content_not_position(make_raw):
+    raw = make_raw(500).drop(columns="Visit ID")
+    raw = pd.concat([raw, raw.iloc[:3]], ignore_index=True)
+    keys = add_row_keys(raw.copy())["Visit ID"]
+
+    shuffled = pd.concat([make_raw(50, seed=3).drop(columns="Visit ID"), raw.iloc[::-1]], ignore_index=True)
+    shuffled_keys = add_row_keys(shuffled)["Visit ID"]
+
+    assert keys.is_unique
+    assert set(keys) <= set(shuffled_keys)
@@ -0,0 +1,55 @@
+import numpy as np
+
+from dashboard.episodes import DEFAULT_PAIRING, PAIRING_RULES
+from dashboard.metrics import FilterState, MetricCache, compute
+
+
+def array(nbytes):
+    return np.zeros(nbytes, dtype=np.uint8)
+
+
+def test_evicts_least_recently_used_beyond_maxsize():
+    cache = MetricCache(maxsize=2, maxbytes=2**30)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+
+    assert cache.get_or_compute("a", lambda: "recomputed") == 1
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+    assert cache.stats()["size"] == 2
+
+
+def test_evicts_oldest_beyond_maxbytes():
+    cache = MetricCache(maxsize=100, maxbytes=1_000)
+    for key in "abc":
+        cache.get_or_compute(key, lambda: array(400))
+
+    stats = cache.stats()
+    assert stats["size"] == 2
+    assert stats["nbytes"] == 800
+    assert cache.get_or_compute("a", lambda: None) is None
+
+
+def test_keeps_newest_entry_even_over_budget():
+    cache = MetricCache(maxsize=100, maxbytes=1_000)
+    cache.get_or_compute("small", lambda: array(100))
+    big = cache.get_or_compute("big", lambda: array(5_000))
+
+    assert cache.stats()["size"] == 1
+    assert cache.get_or_compute("big", lambda: None) is big
+    cache.clear()
+    assert cache.stats()["nbytes"] == 0
+
+
+def test_pairing_only_keys_the_metrics_that_use_it(dataset):
+    cache = MetricCache()
+    state = FilterState.create("2024-01-01", "2024-12-31", {})
+
+    compute("selection.rows", dataset, state, cache=cache, pairing="first")
+    compute("selection.rows", dataset, state, cache=cache, pairing="nearest_preceding")
+    assert cache.stats()["misses"] == 1
+
+    delays = {rule: compute("growth.ccm_delays", dataset, state, cache=cache, pairing=rule) for rule in PAIRING_RULES}
+    assert not delays["first"].equals(delays["nearest_preceding"])
+    assert compute("growth.ccm_delays", dataset, state, cache=cache) is delays[DEFAULT_PAIRING]